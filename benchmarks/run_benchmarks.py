@@ -0,0 +1,256 @@
+import sys
+import json
+import platform
+import tracemalloc
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from importlib import import_module
+from os import environ, makedirs
+from os.path import abspath, dirname, join, exists
+from time import perf_counter
+
+# Headless: Qt renders offscreen and matplotlib draws through Agg, no window is ever shown
+environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+import numpy
+from numpy.random import default_rng
+from pandas import DataFrame
+
+BENCHMARK_DIR = dirname(abspath(__file__))
+DEFAULT_RESULTS = join(BENCHMARK_DIR, 'results.json')
+DEFAULT_BASELINE = join(BENCHMARK_DIR, 'baseline.json')
+
+PRESETS = {
+    'quick': {'rows': [1_000, 100_000], 'features': [4, 100], 'classes': [3, 50]},
+    'full': {'rows': [1_000, 10_000, 100_000, 1_000_000, 10_000_000], 'features': [4, 100, 1_000, 10_000],
+             'classes': [3, 50, 1_000]},
+}
+STAGES = ('fit', 'transform', 'run_pca', 'pca_dataframe', 'table_model', 'plot_2d', 'plot_3d')
+# Stages that depend on the label column run once per label cardinality
+LABEL_STAGES = ('run_pca', 'pca_dataframe', 'plot_2d', 'plot_3d')
+PRELOAD_MODULES = ('sklearn.preprocessing', 'sklearn.decomposition', 'matplotlib.figure', 'mpl_toolkits.mplot3d')
+
+def make_dataset(n_rows, n_features, seed=0, rank=5):
+    # Low-rank signal plus noise, so the leading components carry most of the variance
+    rng = default_rng(seed)
+    rank = min(rank, n_features)
+    X = rng.standard_normal((n_rows, rank)) @ rng.standard_normal((rank, n_features))
+    X += 0.1 * rng.standard_normal((n_rows, n_features))
+    return DataFrame(X, columns=[f"x{i}" for i in range(n_features)], copy=False)
+
+def make_labels(n_rows, n_classes, seed=0):
+    rng = default_rng(seed + 1)
+    names = numpy.array([f"class_{i}" for i in range(n_classes)], dtype=object)
+    return names[rng.integers(0, n_classes, n_rows)]
+
+def measure(fn, setup=None, repeat=3):
+    # Best of `repeat` untraced runs for the time, one traced run for the peak allocation
+    best = None
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = perf_counter()
+        fn(state)
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    state = setup() if setup else None
+    tracemalloc.start()
+    try:
+        fn(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+def scroll_table(model, positions=50, visible_rows=40, visible_columns=20):
+    # What a view asks for while the user scrolls from top to bottom
+    from PyQt6.QtCore import Qt
+    n_rows = model.rowCount()
+    n_columns = min(visible_columns, model.columnCount())
+    for step in range(positions):
+        top = (n_rows - visible_rows) * step // max(1, positions - 1) if n_rows > visible_rows else 0
+        for row in range(top, min(n_rows, top + visible_rows)):
+            for column in range(n_columns):
+                index = model.index(row, column)
+                model.data(index, Qt.ItemDataRole.DisplayRole)
+                model.data(index, Qt.ItemDataRole.BackgroundRole)
+
+def draw_figure(figure):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    FigureCanvasAgg(figure).draw()
+
+def fitted_interface(df, columns, label_column):
+    from src.pca_interface import PCAInterface
+    pca_interface = PCAInterface()
+    pca_interface.load_data(df, columns, label_column)
+    pca_interface.run_pca(3)
+    return pca_interface
+
+def run_case(df, columns, label_column, stages, repeat):
+    from src.pca_calc import PCACalculator
+    from src.pca_interface import PCAInterface
+    X = df[columns].values
+    timings = {}
+
+    if 'fit' in stages:
+        timings['fit'] = measure(lambda _: PCACalculator().fit_transform(X, 3), repeat=repeat)
+    if 'transform' in stages:
+        calculator = PCACalculator()
+        calculator.fit_transform(X, 3)
+        timings['transform'] = measure(lambda _: calculator.transform(X), repeat=repeat)
+    if 'table_model' in stages:
+        from PyQt6.QtWidgets import QApplication
+        from src.pca_gui import SelectableHeaderModel
+        app = QApplication.instance() or QApplication([])
+        timings['table_model'] = measure(lambda _: scroll_table(SelectableHeaderModel(df)), repeat=repeat)
+
+    if label_column is None:
+        return timings
+
+    def fresh_run(_):
+        pca_interface = PCAInterface()
+        pca_interface.load_data(df, columns, label_column)
+        pca_interface.run_pca(3)
+
+    if 'run_pca' in stages:
+        timings['run_pca'] = measure(fresh_run, repeat=repeat)
+
+    pca_interface = fitted_interface(df, columns, label_column)
+    if 'pca_dataframe' in stages:
+        def reset_frame():
+            pca_interface._pca_dataframe = None
+        timings['pca_dataframe'] = measure(lambda _: pca_interface.get_pca_dataframe(), reset_frame, repeat)
+
+    for stage, is_3d in (('plot_2d', False), ('plot_3d', True)):
+        if stage in stages:
+            from src.pca_visualizer import PCAVisualizer
+            timings[stage] = measure(lambda _: draw_figure(PCAVisualizer(pca_interface).visualize(is_3d)[0]), repeat=repeat)
+    return timings
+
+def run_suite(rows, features, classes, stages, repeat=3, max_cells=200_000_000, seed=0):
+    # Deferred imports are paid up front; pca_entry.py --startup-report covers their cost
+    for name in PRELOAD_MODULES:
+        import_module(name)
+
+    records = []
+    for n_rows in rows:
+        for n_features in features:
+            if n_rows * n_features > max_cells:
+                print(f"skip rows={n_rows:,} features={n_features:,} (over --max-cells)")
+                continue
+            df = make_dataset(n_rows, n_features, seed)
+            columns = list(df.columns)
+
+            # Label-free stages once per shape, label stages once per cardinality
+            label_free = [stage for stage in stages if stage not in LABEL_STAGES]
+            passes = [(None, label_free)] if label_free else []
+            label_stages = [stage for stage in stages if stage in LABEL_STAGES]
+            if label_stages:
+                passes += [(n_classes, label_stages) for n_classes in classes]
+
+            for n_classes, pass_stages in passes:
+                frame = df
+                label_column = None
+                if n_classes is not None:
+                    frame = df.assign(label=make_labels(n_rows, n_classes, seed))
+                    label_column = 'label'
+                case = {'rows': n_rows, 'features': n_features, 'classes': n_classes}
+                for stage, (seconds, peak) in run_case(frame, columns, label_column, pass_stages, repeat).items():
+                    records.append({**case, 'stage': stage, 'seconds': seconds, 'peak_bytes': peak})
+                    print(f"{record_key(records[-1]):<48} {seconds:10.4f}s {peak / 1024 ** 2:10.1f} MB")
+    return records
+
+def record_key(record):
+    key = f"{record['stage']} rows={record['rows']} features={record['features']}"
+    if record['classes'] is not None:
+        key += f" classes={record['classes']}"
+    return key
+
+def environment():
+    import sklearn, pandas, matplotlib
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'numpy': numpy.__version__,
+        'pandas': pandas.__version__,
+        'sklearn': sklearn.__version__,
+        'matplotlib': matplotlib.__version__,
+    }
+
+def compare(records, baseline, threshold, memory_threshold):
+    # A stage regresses when it is slower (or allocates more) than the baseline by more than the threshold
+    previous = {record_key(record): record for record in baseline['records']}
+    regressions = []
+    for record in records:
+        old = previous.get(record_key(record))
+        if old is None:
+            continue
+        time_ratio = record['seconds'] / old['seconds'] if old['seconds'] > 0 else 1.0
+        memory_ratio = record['peak_bytes'] / old['peak_bytes'] if old['peak_bytes'] > 0 else 1.0
+        flags = []
+        if time_ratio > 1 + threshold:
+            flags.append(f"time x{time_ratio:.2f}")
+        if memory_ratio > 1 + memory_threshold:
+            flags.append(f"memory x{memory_ratio:.2f}")
+        status = "REGRESSION " + ", ".join(flags) if flags else "ok"
+        print(f"{record_key(record):<48} time x{time_ratio:5.2f}  memory x{memory_ratio:5.2f}  {status}")
+        if flags:
+            regressions.append((record_key(record), flags))
+    return regressions
+
+def build_parser():
+    parser = ArgumentParser(description="Benchmark PCA fit, transform, table model and plotting on synthetic data")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default='quick', help="Size sweep (default: quick)")
+    parser.add_argument("--rows", type=int, nargs="+", help="Row counts, overriding the preset")
+    parser.add_argument("--features", type=int, nargs="+", help="Feature counts, overriding the preset")
+    parser.add_argument("--classes", type=int, nargs="+", help="Label cardinalities, overriding the preset")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="Stages to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage, the best is kept (default: 3)")
+    parser.add_argument("--max-cells", type=int, default=200_000_000,
+                        help="Skip datasets with more rows x features than this (default: 2e8)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic data (default: 0)")
+    parser.add_argument("-o", "--output", default=DEFAULT_RESULTS, help="Results file (default: benchmarks/results.json)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline to compare against (default: benchmarks/baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed slowdown before a stage counts as a regression (default: 0.2 = 20%%)")
+    parser.add_argument("--memory-threshold", type=float, default=None,
+                        help="Allowed peak memory growth (default: same as --threshold)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    preset = PRESETS[args.preset]
+    records = run_suite(
+        args.rows or preset['rows'], args.features or preset['features'], args.classes or preset['classes'],
+        args.stages, args.repeat, args.max_cells, args.seed
+    )
+    results = {'environment': environment(), 'repeat': args.repeat, 'seed': args.seed, 'records': records}
+
+    makedirs(dirname(abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    memory_threshold = args.threshold if args.memory_threshold is None else args.memory_threshold
+    regressions = compare(records, baseline, args.threshold, memory_threshold)
+    print(f"{len(regressions)} regression(s) against {args.baseline}")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,14 @@
-from src.pca_gui import PCACalculatorApp
-from PyQt6.QtWidgets import QApplication
 import sys
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
-    window = PCACalculatorApp()
-    window.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    # Headless batch and serve modes never import the GUI stack
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        from src.pca_cli import main
+        sys.exit(main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        from src.pca_service import main
+        sys.exit(main(sys.argv[2:]))
+
+    # Imports are timed and scikit-learn/matplotlib deferred until the window is up
+    from src.pca_startup import run_gui
+    sys.exit(run_gui(sys.argv))
@@ -1,36 +1,572 @@
-from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
+from numpy import (ix_, empty, float32, zeros, sqrt, outer, asarray, argsort, abs as np_abs, argmax, arange, sign, float64,
+                   array, einsum, concatenate, block, load as np_load, savez_compressed)
+from numpy.linalg import eigh
+from numpy.random import default_rng
+from time import perf_counter
+from .pca_instrument import NO_INSTRUMENTATION
+
+SOLVERS = ('auto', 'full', 'randomized', 'covariance_eigh')
+TRANSFORM_CHUNK_ROWS = 65_536
+MODEL_FORMAT_VERSION = 1
+KERNELS = ('rbf', 'poly', 'sigmoid', 'laplacian', 'cosine')
+KERNEL_PARAMS = {'rbf': ('gamma',), 'poly': ('gamma', 'degree', 'coef0'), 'sigmoid': ('gamma', 'coef0'),
+                 'laplacian': ('gamma',), 'cosine': ()}
+N_LANDMARKS = 500
+# Rows per batch of kernel features; each batch holds rows x landmarks floats
+KERNEL_CHUNK_ROWS = 8192
+
+class StreamingMoments:
+    def __init__(self, n_features=None):
+        self.count = 0
+        self.mean = None
+        self.comoment = None
+        if n_features is not None:
+            self.mean = zeros(n_features)
+            self.comoment = zeros((n_features, n_features))
+
+    def update(self, X):
+        X = asarray(X, dtype=float64)
+        if X.shape[0] == 0:
+            return self
+        chunk_mean = X.mean(axis=0)
+        centered = X - chunk_mean
+        return self._combine(X.shape[0], chunk_mean, centered.T @ centered)
+
+    def merge(self, other):
+        # Partial results over disjoint rows (e.g. one per shard) combine exactly like chunks do
+        if other.count == 0:
+            return self
+        return self._combine(other.count, other.mean, other.comoment)
+
+    def _combine(self, n, chunk_mean, chunk_comoment):
+        if self.mean is None:
+            self.mean = zeros(len(chunk_mean))
+            self.comoment = zeros((len(chunk_mean), len(chunk_mean)))
+        if len(chunk_mean) != len(self.mean):
+            raise ValueError(f"Cannot combine moments of {len(chunk_mean)} columns into {len(self.mean)} columns")
+
+        # Chan et al. pairwise update of the chunk statistics into the running totals
+        total = self.count + n
+        delta = chunk_mean - self.mean
+        self.comoment += chunk_comoment + outer(delta, delta) * (self.count * n / total)
+        self.mean += delta * (n / total)
+        self.count = total
+        return self
+
+    def forget(self, factor):
+        # Exponential forgetting: earlier rows count `factor` times as much from here on
+        if factor != 1.0:
+            self.count *= factor
+            self.comoment *= factor
+        return self
+
+    def copy(self):
+        copied = StreamingMoments()
+        copied.count = self.count
+        copied.mean = None if self.mean is None else self.mean.copy()
+        copied.comoment = None if self.comoment is None else self.comoment.copy()
+        return copied
+
+    def add_columns(self, mean, cross_comoment, comoment):
+        # Joins moments of more columns over the same rows; cross_comoment pairs the existing
+        # columns (rows) with the added ones (columns)
+        self.mean = concatenate([self.mean, mean])
+        self.comoment = block([[self.comoment, cross_comoment], [cross_comoment.T, comoment]])
+        return self
+
+    def subset(self, indices):
+        subset = StreamingMoments()
+        subset.count = self.count
+        subset.mean = self.mean[indices]
+        subset.comoment = self.comoment[ix_(indices, indices)]
+        return subset
+
+    def get_variance(self):
+        # Population variance, matching StandardScaler
+        return self.comoment.diagonal() / self.count
+
+    def get_scale(self):
+        scale = sqrt(self.get_variance())
+        scale[scale == 0.0] = 1.0
+        return scale
+
+    def get_correlation(self):
+        # Covariance of the standardized data (ddof=1), i.e. what PCA sees after StandardScaler
+        scale = self.get_scale()
+        return self.comoment / outer(scale, scale) / (self.count - 1)
+
+def is_sparse(X):
+    # Duck-typed so scipy is only imported once sparse data is actually used
+    return hasattr(X, 'tocsr') and hasattr(X, 'nnz')
+
+def sparse_moments(X):
+    # Column means and population scales from the nonzeros only
+    X = X.tocsr()
+    mean = asarray(X.mean(axis=0), dtype=float64).ravel()
+    mean_square = asarray(X.multiply(X).mean(axis=0), dtype=float64).ravel()
+    scale = sqrt((mean_square - mean ** 2).clip(min=0.0))
+    constant = scale == 0.0
+    scale[constant] = 1.0
+    return mean, scale, constant
+
+def align_signs(components):
+    # Deterministic signs: largest absolute loading of each component is positive
+    signs = sign(components[arange(components.shape[0]), argmax(np_abs(components), axis=1)])
+    signs[signs == 0] = 1.0
+    components *= signs[:, None]
+    return components
+
+def standardize_in_place(X, chunksize=TRANSFORM_CHUNK_ROWS):
+    # Column means and population scales accumulated in float64 over row chunks, then
+    # X is centered and scaled in its own buffer; no full-size temporary is allocated
+    count = 0
+    mean = zeros(X.shape[1])
+    m2 = zeros(X.shape[1])
+    for start in range(0, X.shape[0], chunksize):
+        chunk = X[start:start + chunksize].astype(float64)
+        n = chunk.shape[0]
+        chunk_mean = chunk.mean(axis=0)
+        chunk_m2 = ((chunk - chunk_mean) ** 2).sum(axis=0)
+        total = count + n
+        delta = chunk_mean - mean
+        m2 += chunk_m2 + delta ** 2 * (count * n / total)
+        mean += delta * (n / total)
+        count = total
+
+    scale = sqrt(m2 / count)
+    scale[scale == 0.0] = 1.0
+    for start in range(0, X.shape[0], chunksize):
+        X[start:start + chunksize] -= mean.astype(X.dtype)
+        X[start:start + chunksize] /= scale.astype(X.dtype)
+    return mean, scale
+
+class NystromMap:
+    # Low-rank kernel feature map from a sample of landmark rows: k(x, L) U diag(1/sqrt(lambda)),
+    # whose inner products approximate the kernel. Costs rows x landmarks per batch, never n x n
+    def __init__(self, kernel='rbf', gamma=None, degree=3, coef0=1.0):
+        if kernel not in KERNELS:
+            raise ValueError(f"Unknown kernel '{kernel}', expected one of {KERNELS}")
+        self.kernel = kernel
+        self.gamma = gamma
+        self.degree = degree
+        self.coef0 = coef0
+        self.landmarks = None
+        self.projection = None
+
+    def get_params(self):
+        params = {'gamma': self.gamma, 'degree': self.degree, 'coef0': self.coef0}
+        return {name: params[name] for name in KERNEL_PARAMS[self.kernel] if params[name] is not None}
+
+    def fit(self, landmarks):
+        self.landmarks = landmarks
+        eigenvalues, eigenvectors = eigh(self._kernel(landmarks))
+        # Near-null directions of the landmark kernel would blow up under 1/sqrt(lambda)
+        keep = eigenvalues > eigenvalues.max() * 1e-10
+        self.projection = eigenvectors[:, keep] / sqrt(eigenvalues[keep])
+        return self
+
+    def _kernel(self, X):
+        from sklearn.metrics.pairwise import pairwise_kernels
+        return pairwise_kernels(X, self.landmarks, metric=self.kernel, **self.get_params())
+
+    def features(self, X):
+        return self._kernel(X) @ self.projection
 
 class PCACalculator:
-    def __init__(self):
+    def __init__(self, instrumentation=NO_INSTRUMENTATION):
+        self.instrumentation = instrumentation
         self.pca = None
         self.scaler = None
         self.explained_variance_ratio = None
+        self.explained_variance = None
         self.n_components = None
+        self.components = None
+        self.mean = None
+        self.scale = None
+        self.solver = None
+        self.fit_time = None
+        # Set for kernel PCA: components then live in the Nystrom feature space
+        self.kernel_map = None
+        self.feature_mean = None
+        # Running count, means and co-moments of the fitted rows; kept by moment-based fits for partial_fit
+        self.moments = None
+
+    def select_solver(self, n_samples, n_features, n_components=None):
+        # Few features relative to rows: the p x p covariance is cheap to build and decompose
+        if n_features <= 1000 and n_samples >= 10 * n_features:
+            return 'covariance_eigh'
+        # Small rank on a big matrix: a randomized range finder beats a full SVD
+        if n_components is not None and max(n_samples, n_features) > 500 \
+                and n_components < 0.8 * min(n_samples, n_features):
+            return 'randomized'
+        return 'full'
+
+    def fit_transform(self, X, n_components=None, solver='auto', copy=True):
+        if solver not in SOLVERS:
+            raise ValueError(f"Unknown solver '{solver}', expected one of {SOLVERS}")
+        start = perf_counter()
+        # scikit-learn is imported on the first fit, not when the app starts
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.decomposition import PCA
+
+        # Standardize the features; with copy=False a float array is standardized in place
+        with self.instrumentation.span('standardize', in_place=not copy):
+            if not copy and getattr(X, 'dtype', None) in (float32, float64) and X.flags.writeable:
+                self.scaler = None
+                mean, scale = standardize_in_place(X)
+                X_scaled = X
+            else:
+                self.scaler = StandardScaler()
+                X_scaled = self.scaler.fit_transform(X)
+                mean, scale = self.scaler.mean_, self.scaler.scale_
+
+        if solver == 'auto':
+            solver = self.select_solver(X_scaled.shape[0], X_scaled.shape[1], n_components)
+
+        with self.instrumentation.span('decompose', solver=solver):
+            if solver == 'covariance_eigh':
+                # The data is already centered, so X^T X / (n - 1) is its covariance
+                self.pca = None
+                covariance = (X_scaled.T @ X_scaled).astype(float64) / (X_scaled.shape[0] - 1)
+                self._decompose(covariance, n_components, X_scaled.shape[0])
+                X_pca = X_scaled @ self.components.T.astype(X_scaled.dtype)
+            else:
+                # Perform PCA
+                random_state = 0 if solver == 'randomized' else None
+                self.pca = PCA(n_components=n_components, svd_solver=solver, random_state=random_state, copy=copy)
+                X_pca = self.pca.fit_transform(X_scaled)
+
+                # Store results
+                self.explained_variance_ratio = self.pca.explained_variance_ratio_
+                self.explained_variance = self.pca.explained_variance_
+                self.n_components = self.pca.n_components_
+                self.components = self.pca.components_
+
+        self.mean = mean
+        self.scale = scale
+        self.moments = None
+
+        self.solver = solver
+        self.fit_time = perf_counter() - start
+        return X_pca
+
+    def _decompose(self, covariance, n_components, n_samples):
+        n_features = covariance.shape[0]
+        if n_components is None:
+            n_components = min(n_samples, n_features)
+        if n_components > n_features:
+            raise ValueError(f"n_components={n_components} must be at most the number of columns ({n_features})")
+
+        eigenvalues, eigenvectors = eigh(covariance)
+        order = argsort(eigenvalues)[::-1]
+        eigenvalues = eigenvalues[order].clip(min=0.0)
+        components = align_signs(eigenvectors[:, order].T[:n_components])
 
-    def fit_transform(self, X, n_components=None):
-        # Standardize the features
-        self.scaler = StandardScaler()
-        X_scaled = self.scaler.fit_transform(X)
+        total_variance = eigenvalues.sum()
+        self.explained_variance = eigenvalues[:n_components]
+        self.explained_variance_ratio = self.explained_variance / total_variance if total_variance > 0 else zeros(n_components)
+        self.n_components = n_components
+        self.components = components
 
-        # Perform PCA
-        self.pca = PCA(n_components=n_components)
-        X_pca = self.pca.fit_transform(X_scaled)
+    def fit_moments(self, moments, n_components=None):
+        if moments.count < 2:
+            raise ValueError("At least two rows are required to run PCA")
+        start = perf_counter()
 
-        # Store results
-        self.explained_variance_ratio = self.pca.explained_variance_ratio_
-        self.n_components = self.pca.n_components_
+        self.pca = None
+        self.scaler = None
+        with self.instrumentation.span('decompose', solver='precomputed_correlation'):
+            self._decompose(moments.get_correlation(), n_components, moments.count)
+        self.mean = moments.mean.copy()
+        self.scale = moments.get_scale()
+        self.moments = moments
+        self.solver = 'precomputed_correlation'
+        self.fit_time = perf_counter() - start
+
+    def fit_stream(self, chunks, n_components=None):
+        start = perf_counter()
+        moments = StreamingMoments()
+        with self.instrumentation.span('accumulate_moments'):
+            for chunk in chunks:
+                moments.update(chunk)
+        self.fit_moments(moments, n_components)
+        self.solver = 'streaming'
+        self.fit_time = perf_counter() - start
+        return moments
+
+    def partial_fit(self, X, forgetting=1.0, chunksize=TRANSFORM_CHUNK_ROWS):
+        # Folds a new batch of rows into the running moments and decomposes again: the cost grows with
+        # the batch and the number of columns, never with the rows already seen. forgetting < 1
+        # down-weights everything seen before by that factor, so the model can follow drift
+        if self.kernel_map is not None:
+            raise ValueError("Kernel PCA models cannot be updated")
+        if self.moments is None:
+            raise ValueError("This fit keeps no running moments; refit with fit_moments or fit_stream first")
+        if not 0.0 < forgetting <= 1.0:
+            raise ValueError(f"forgetting must be in (0, 1], got {forgetting}")
+        X = asarray(X)
+        start = perf_counter()
+        previous = self.components
+
+        with self.instrumentation.span('update_moments', rows=X.shape[0], forgetting=forgetting):
+            # A copy: fits truncated from the same result share their moments
+            moments = self.moments.copy().forget(forgetting)
+            for row in range(0, X.shape[0], chunksize):
+                moments.update(X[row:row + chunksize])
+        self.fit_moments(moments, self.n_components)
+
+        # Keep each component pointing the way it did before, so scores stay comparable across updates
+        flip = (self.components * previous).sum(axis=1) < 0
+        self.components[flip] *= -1
+        self.solver = 'incremental'
+        self.fit_time = perf_counter() - start
+        return self
+
+    def fit_kernel(self, X, n_components, kernel='rbf', n_landmarks=N_LANDMARKS, gamma=None,
+                   chunksize=KERNEL_CHUNK_ROWS, random_state=0):
+        # Approximate kernel PCA: linear PCA of Nystrom features, built and projected in row batches,
+        # so time and memory grow linearly with the number of rows
+        if kernel not in KERNELS:
+            raise ValueError(f"Unknown kernel '{kernel}', expected one of {KERNELS}")
+        X = asarray(X)
+        n_samples = X.shape[0]
+        if n_samples < 2:
+            raise ValueError("At least two rows are required to run PCA")
+        start = perf_counter()
+
+        with self.instrumentation.span('standardize', kernel=kernel):
+            moments = StreamingMoments()
+            for row in range(0, n_samples, chunksize):
+                moments.update(X[row:row + chunksize])
+            mean, scale = moments.mean, moments.get_scale()
+
+        with self.instrumentation.span('landmarks', n_landmarks=n_landmarks):
+            rng = default_rng(random_state)
+            rows = rng.choice(n_samples, size=min(n_landmarks, n_samples), replace=False)
+            rows.sort()
+            kernel_map = NystromMap(kernel, gamma)
+            kernel_map.fit((X[rows] - mean) / scale)
+
+        n_features = kernel_map.projection.shape[1]
+        if n_components is not None and n_components > n_features:
+            raise ValueError(f"n_components={n_components} exceeds the {n_features} usable landmark directions")
+
+        with self.instrumentation.span('kernel_moments'):
+            feature_moments = StreamingMoments()
+            for row in range(0, n_samples, chunksize):
+                feature_moments.update(kernel_map.features((X[row:row + chunksize] - mean) / scale))
+
+        self.pca = None
+        self.scaler = None
+        with self.instrumentation.span('decompose', solver=f"nystrom_{kernel}"):
+            # Covariance, not correlation: the feature space has no natural units to scale away
+            self._decompose(feature_moments.comoment / (feature_moments.count - 1), n_components, n_samples)
+        self.mean = mean
+        self.scale = scale
+        self.kernel_map = kernel_map
+        self.feature_mean = feature_moments.mean
+        self.moments = None
+        self.solver = f"nystrom_{kernel}"
+
+        with self.instrumentation.span('project'):
+            X_pca = self.transform(X, chunksize)
+        self.fit_time = perf_counter() - start
+        return X_pca
+
+    def fit_sparse(self, X, n_components):
+        # Truncated SVD of the standardized matrix through a LinearOperator: centering and
+        # scaling are applied implicitly in every product, so X is never densified and the
+        # memory needed grows with its nonzeros (plus the n x k score block)
+        from scipy.sparse.linalg import LinearOperator, svds
+        n_samples, n_features = X.shape
+        if n_components is None or not 0 < n_components < min(n_samples, n_features):
+            raise ValueError(f"Sparse input needs 0 < n_components < {min(n_samples, n_features)}, got {n_components}")
+        start = perf_counter()
 
+        X = X.tocsr()
+        with self.instrumentation.span('standardize', sparse=True):
+            mean, scale, constant = sparse_moments(X)
+        X_t = X.T.tocsr()
+
+        def matvec(v):
+            v = asarray(v, dtype=float64).reshape(n_features, -1) / scale[:, None]
+            return X @ v - mean @ v
+
+        def rmatvec(u):
+            u = asarray(u, dtype=float64).reshape(n_samples, -1)
+            return (X_t @ u - outer(mean, u.sum(axis=0))) / scale[:, None]
+
+        operator = LinearOperator((n_samples, n_features), matvec=matvec, rmatvec=rmatvec,
+                                  matmat=matvec, rmatmat=rmatvec, dtype=float64)
+        with self.instrumentation.span('decompose', solver='sparse_arpack'):
+            _, singular_values, vt = svds(operator, k=n_components, solver='arpack', random_state=0)
+        order = argsort(singular_values)[::-1]
+
+        self.pca = None
+        self.scaler = None
+        self.components = align_signs(vt[order])
+        self.explained_variance = singular_values[order] ** 2 / (n_samples - 1)
+        # Every non-constant standardized column has variance n / (n - 1)
+        total_variance = (~constant).sum() * n_samples / (n_samples - 1)
+        self.explained_variance_ratio = self.explained_variance / total_variance if total_variance > 0 else zeros(n_components)
+        self.n_components = n_components
+        self.mean = mean
+        self.scale = scale
+        self.moments = None
+        self.solver = 'sparse_arpack'
+
+        X_pca = self.transform(X)
+        self.fit_time = perf_counter() - start
         return X_pca
 
+    def transform(self, X, chunksize=TRANSFORM_CHUNK_ROWS):
+        if self.components is None:
+            raise ValueError("PCA has not been fitted yet")
+        if self.kernel_map is not None:
+            X = asarray(X)
+            chunksize = min(chunksize, KERNEL_CHUNK_ROWS)
+            scores = empty((X.shape[0], self.n_components), dtype=float32 if X.dtype == float32 else float64)
+            for start in range(0, X.shape[0], chunksize):
+                features = self.kernel_map.features((X[start:start + chunksize] - self.mean) / self.scale)
+                scores[start:start + chunksize] = (features - self.feature_mean) @ self.components.T
+            return scores
+        if is_sparse(X):
+            # Centering folded into a constant row offset: X W - (mean / scale) C^T, no dense copy of X
+            dtype = float32 if X.dtype == float32 else float64
+            weights = self.components.T / self.scale[:, None]
+            offset = (self.mean / self.scale) @ self.components.T
+            X = X.tocsr()
+            scores = empty((X.shape[0], self.n_components), dtype=dtype)
+            for start in range(0, X.shape[0], chunksize):
+                scores[start:start + chunksize] = X[start:start + chunksize] @ weights - offset
+            return scores
+        X = asarray(X)
+        # float32 input stays float32; row chunks keep the temporaries small
+        dtype = float32 if X.dtype == float32 else float64
+        mean = self.mean.astype(dtype)
+        scale = self.scale.astype(dtype)
+        components = self.components.T.astype(dtype)
+
+        scores = empty((X.shape[0], self.n_components), dtype=dtype)
+        for start in range(0, X.shape[0], chunksize):
+            scores[start:start + chunksize] = ((X[start:start + chunksize] - mean) / scale) @ components
+        return scores
+
+    def truncate(self, n_components):
+        # Leading components of a fit are the lower-rank fit, so slicing is enough
+        if n_components is None or n_components == self.n_components:
+            return self
+        if n_components > self.n_components:
+            raise ValueError(f"Cannot truncate a {self.n_components}-component fit to {n_components} components")
+
+        truncated = PCACalculator(self.instrumentation)
+        truncated.scaler = self.scaler
+        truncated.explained_variance_ratio = self.explained_variance_ratio[:n_components]
+        truncated.explained_variance = self.explained_variance[:n_components]
+        truncated.n_components = n_components
+        truncated.components = self.components[:n_components]
+        truncated.mean = self.mean
+        truncated.scale = self.scale
+        truncated.solver = self.solver
+        truncated.fit_time = self.fit_time
+        truncated.kernel_map = self.kernel_map
+        truncated.feature_mean = self.feature_mean
+        truncated.moments = self.moments
+        return truncated
+
+    def save(self, file_name, columns):
+        # Everything transform and inverse_transform need, with the column names in fit order
+        if self.components is None:
+            raise ValueError("PCA has not been fitted yet")
+        if self.kernel_map is not None:
+            raise ValueError("Kernel PCA models cannot be saved")
+        if len(columns) != self.components.shape[1]:
+            raise ValueError(f"Expected {self.components.shape[1]} column names, got {len(columns)}")
+        savez_compressed(
+            file_name,
+            format_version=MODEL_FORMAT_VERSION,
+            columns=array([str(column) for column in columns]),
+            mean=self.mean,
+            scale=self.scale,
+            components=self.components,
+            explained_variance=self.explained_variance,
+            explained_variance_ratio=self.explained_variance_ratio,
+            solver=array(self.solver or ''),
+        )
+
+    def load(self, file_name):
+        # Restores a saved model in place and returns its column names
+        with np_load(file_name, allow_pickle=False) as model:
+            version = int(model['format_version'])
+            if version > MODEL_FORMAT_VERSION:
+                raise ValueError(f"{file_name} uses model format {version}, newer than the supported {MODEL_FORMAT_VERSION}")
+            self.pca = None
+            self.scaler = None
+            self.mean = model['mean']
+            self.scale = model['scale']
+            self.components = model['components']
+            self.explained_variance = model['explained_variance']
+            self.explained_variance_ratio = model['explained_variance_ratio']
+            self.n_components = self.components.shape[0]
+            self.solver = str(model['solver']) or None
+            self.fit_time = None
+            self.kernel_map = None
+            self.feature_mean = None
+            self.moments = None
+            return [str(column) for column in model['columns']]
+
     def get_explained_variance_ratio(self):
         return self.explained_variance_ratio
 
     def get_n_components(self):
         return self.n_components
 
-    def inverse_transform(self, X_pca):
-        # Inverse transform PCA
-        X_scaled = self.pca.inverse_transform(X_pca)
-        # Inverse transform scaling
-        return self.scaler.inverse_transform(X_scaled)
\ No newline at end of file
+    def get_components(self):
+        return self.components
+
+    def get_solver(self):
+        return self.solver
+
+    def get_fit_time(self):
+        return self.fit_time
+
+    def inverse_transform(self, X_pca, chunksize=TRANSFORM_CHUNK_ROWS, out=None):
+        if self.components is None:
+            raise ValueError("PCA has not been fitted yet")
+        if self.kernel_map is not None:
+            raise ValueError("Kernel PCA has no linear inverse transform")
+        X_pca = asarray(X_pca)
+        if out is None:
+            out = empty((X_pca.shape[0], self.components.shape[1]), dtype=float32 if X_pca.dtype == float32 else float64)
+        # Inverse transform PCA, then the scaling, a row chunk at a time into `out` (which may be a memmap)
+        for start in range(0, X_pca.shape[0], chunksize):
+            X_scaled = X_pca[start:start + chunksize] @ self.components
+            X_scaled *= self.scale
+            X_scaled += self.mean
+            out[start:start + chunksize] = X_scaled
+        return out
+
+    def reconstruction_error(self, X, chunksize=TRANSFORM_CHUNK_ROWS, reconstructed=None):
+        # Squared residual of each row after projecting onto the components, in standardized units
+        # (the Q statistic). Only row chunks are ever materialized; pass an array, e.g. a memmap, as
+        # `reconstructed` to also receive the reconstruction in the original units
+        if self.components is None:
+            raise ValueError("PCA has not been fitted yet")
+        if self.kernel_map is not None:
+            raise ValueError("Kernel PCA has no linear inverse transform")
+        sparse = is_sparse(X)
+        X = X.tocsr() if sparse else asarray(X)
+        errors = empty(X.shape[0])
+        for start in range(0, X.shape[0], chunksize):
+            chunk = X[start:start + chunksize]
+            Z = (chunk.toarray() if sparse else chunk) - self.mean
+            Z /= self.scale
+            Z_hat = (Z @ self.components.T) @ self.components
+            # In place: Z becomes the residual
+            Z -= Z_hat
+            errors[start:start + chunksize] = einsum('ij,ij->i', Z, Z)
+            if reconstructed is not None:
+                Z_hat *= self.scale
+                Z_hat += self.mean
+                reconstructed[start:start + chunksize] = Z_hat
+        return errors
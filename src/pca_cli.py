@@ -0,0 +1,166 @@
+import json
+from argparse import ArgumentParser
+from concurrent.futures import as_completed
+from glob import glob
+from os import makedirs, cpu_count
+from os.path import abspath, commonpath, dirname, relpath, splitext, join
+from pandas import DataFrame
+from pandas.api.types import is_numeric_dtype, is_bool_dtype
+from .pca_calc import SOLVERS
+from .pca_interface import PCAInterface
+from .pca_loaders import open_source
+from .pca_shard import fit_shards
+from .pca_pool import spawn_pool
+from .pca_export import EXPORT_FORMATS, EXTENSIONS, build_metadata, write_table
+
+# Headless entry point: this module must never import PyQt6 or matplotlib
+
+def build_parser():
+    parser = ArgumentParser(prog="pca_entry.py batch", description="Run PCA on many files without the GUI")
+    parser.add_argument("inputs", nargs="+", help="Input files or glob patterns")
+    parser.add_argument("-c", "--columns", nargs="+", default=None,
+                        help="Columns to use (default: every numeric column except the label)")
+    parser.add_argument("-l", "--label", default=None, help="Optional label column copied into the scores")
+    parser.add_argument("-n", "--components", type=int, default=2, help="Number of components (default: 2)")
+    parser.add_argument("-s", "--solver", choices=SOLVERS, default="auto", help="PCA solver (default: auto)")
+    parser.add_argument("-o", "--output-dir", default="pca_output", help="Output directory (default: pca_output)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--sharded", action="store_true",
+                        help="Treat the inputs as row shards of one dataset: one fit over all of them, scores per shard")
+    parser.add_argument("-f", "--format", choices=('csv',) + EXPORT_FORMATS, default="csv",
+                        help="Output format; parquet and feather keep the fit metadata in the file (default: csv)")
+    return parser
+
+def expand_inputs(patterns):
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob(pattern))
+        files.extend(matches if matches else [pattern])
+    return list(dict.fromkeys(files))
+
+def output_prefixes(files, output_dir):
+    # Output path stem per input: its path below the inputs' common directory, so inputs with the
+    # same file name in different directories keep separate outputs
+    paths = [abspath(file_name) for file_name in files]
+    root = commonpath([dirname(path) for path in paths])
+    prefixes = [join(output_dir, splitext(relpath(path, root))[0]) for path in paths]
+    seen = {}
+    for file_name, prefix in zip(files, prefixes):
+        if prefix in seen:
+            raise ValueError(f"{seen[prefix]} and {file_name} would write the same output files ({prefix}_*)")
+        seen[prefix] = file_name
+    for prefix in prefixes:
+        makedirs(dirname(prefix), exist_ok=True)
+    return prefixes
+
+def default_columns(source, label_column):
+    return [c for c, dtype in source.preview.dtypes.items()
+            if c != label_column and is_numeric_dtype(dtype) and not is_bool_dtype(dtype)]
+
+def write_model_outputs(components, explained_variance_ratio, columns, prefix, fmt='csv', metadata=None):
+    names = [f"PC{i+1}" for i in range(len(explained_variance_ratio))]
+    if fmt != 'csv':
+        extension = EXTENSIONS[fmt]
+        loadings = {'column': [str(column) for column in columns]}
+        loadings.update({name: components[i] for i, name in enumerate(names)})
+        return {
+            'loadings': write_table(f"{prefix}_loadings{extension}", loadings, fmt, metadata)[0],
+            'explained_variance': write_table(f"{prefix}_explained_variance{extension}", {
+                'component': names,
+                'explained_variance_ratio': explained_variance_ratio,
+            }, fmt, metadata)[0],
+        }
+    outputs = {
+        'loadings': f"{prefix}_loadings.csv",
+        'explained_variance': f"{prefix}_explained_variance.csv",
+    }
+    DataFrame(components.T, columns=names, index=columns).to_csv(outputs['loadings'], index_label='column')
+    DataFrame({
+        'component': names,
+        'explained_variance_ratio': explained_variance_ratio,
+    }).to_csv(outputs['explained_variance'], index=False)
+    return outputs
+
+def run_file(file_name, columns, label_column, n_components, solver, output_prefix, fmt='csv'):
+    source = open_source(file_name)
+    if columns is None:
+        columns = default_columns(source, label_column)
+    if len(columns) < n_components:
+        raise ValueError(f"{len(columns)} columns available, at least {n_components} are needed")
+
+    df = source.load_columns(columns + ([label_column] if label_column else []))
+    pca_interface = PCAInterface(cache_max_bytes=0)
+    pca_interface.load_data(df, columns, label_column)
+    results = pca_interface.run_pca(n_components, solver)
+
+    if fmt != 'csv':
+        written = pca_interface.export_results(output_prefix, fmt)
+        outputs = {name: paths[0] for name, paths in written.items()}
+        return {'rows': len(df), 'solver': results['solver'], 'fit_time': results['fit_time'], 'outputs': outputs}
+    outputs = {'scores': f"{output_prefix}_scores.csv"}
+    pca_interface.get_pca_dataframe().to_csv(outputs['scores'], index=False)
+    outputs.update(write_model_outputs(pca_interface.pca_calculator.get_components(), results['explained_variance_ratio'],
+                                       columns, output_prefix))
+
+    return {'rows': len(df), 'solver': results['solver'], 'fit_time': results['fit_time'], 'outputs': outputs}
+
+def run_sharded(files, args):
+    # One fit over every shard (map-reduce of the moments), then each shard's scores from that fit
+    columns = args.columns or default_columns(open_source(files[0]), args.label)
+    if len(columns) < args.components:
+        raise ValueError(f"{len(columns)} columns available, at least {args.components} are needed")
+    extension = EXTENSIONS.get(args.format, '.csv')
+    output_files = [f"{prefix}_scores{extension}" for prefix in output_prefixes(files, args.output_dir)]
+    result = fit_shards(files, columns, args.components, args.label, output_files, args.workers)
+    calculator = result['calculator']
+    metadata = build_metadata(calculator, columns, args.label, sum(result['shard_rows'])) if args.format != 'csv' else None
+    write_model_outputs(calculator.get_components(), calculator.get_explained_variance_ratio(), columns,
+                        join(args.output_dir, "sharded"), args.format, metadata)
+    if args.format == 'npy':
+        # .npy files carry no metadata of their own
+        with open(join(args.output_dir, "sharded_metadata.json"), 'w') as f:
+            json.dump(metadata, f, indent=2)
+    print(f"Fit {sum(result['shard_rows']):,} rows from {len(files)} shards on {result['n_jobs']} workers "
+          f"({result['fit_time']:.3f}s fit, {result['project_time']:.3f}s projection)")
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    files = expand_inputs(args.inputs)
+    makedirs(args.output_dir, exist_ok=True)
+    if args.sharded:
+        if args.solver != 'auto':
+            print("--solver is ignored with --sharded: the merged correlation matrix is decomposed directly")
+        try:
+            run_sharded(files, args)
+        except Exception as e:
+            print(f"FAILED: {e}")
+            return 1
+        print(f"{len(files)} shards processed, results in {args.output_dir}")
+        return 0
+
+    try:
+        prefixes = output_prefixes(files, args.output_dir)
+    except ValueError as e:
+        print(f"FAILED: {e}")
+        return 1
+    workers = max(1, min(args.workers or cpu_count() or 1, len(files)))
+
+    failures = 0
+    with spawn_pool(workers) as pool:
+        futures = {
+            pool.submit(run_file, file_name, args.columns, args.label, args.components, args.solver, prefix,
+                        args.format): file_name
+            for file_name, prefix in zip(files, prefixes)
+        }
+        for future in as_completed(futures):
+            file_name = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"FAILED {file_name}: {e}")
+            else:
+                print(f"OK {file_name}: {summary['rows']:,} rows, {summary['solver']} ({summary['fit_time']:.3f}s)")
+
+    print(f"{len(files) - failures}/{len(files)} files processed, results in {args.output_dir}")
+    return 1 if failures else 0
@@ -0,0 +1,168 @@
+import json
+from datetime import datetime, timezone
+from os.path import splitext
+from numpy import asfortranarray, column_stack, asarray, append, save as np_save
+from numpy.lib.format import open_memmap
+
+try:
+    import pyarrow
+    from pyarrow import parquet as pa_parquet, ipc as pa_ipc
+except ImportError:
+    pyarrow = None
+
+# Columnar export of scores (with labels), loadings and explained variance. Scores are written a
+# row chunk at a time; Parquet and Feather files carry the fit metadata in their schema, .npy
+# exports get a JSON sidecar.
+
+EXPORT_FORMATS = ('parquet', 'feather', 'npy')
+EXTENSIONS = {'parquet': '.parquet', 'feather': '.feather', 'npy': '.npy'}
+FORMATS_BY_EXTENSION = {'.parquet': 'parquet', '.pq': 'parquet', '.feather': 'feather', '.arrow': 'feather', '.npy': 'npy'}
+EXPORT_FILTER = "Parquet (*.parquet);;Feather (*.feather);;NumPy (*.npy)"
+EXPORT_CHUNK_ROWS = 1_048_576
+METADATA_KEY = 'pca_metadata'
+
+def format_from_path(file_name):
+    fmt = FORMATS_BY_EXTENSION.get(splitext(file_name)[1].lower())
+    if fmt is not None:
+        return fmt
+    raise ValueError(f"Cannot tell the export format from '{file_name}', expected one of {', '.join(EXTENSIONS.values())}")
+
+def build_metadata(calculator, columns, label_column=None, n_rows=None):
+    # Enough to know exactly which fit produced the files
+    metadata = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'columns': [str(column) for column in columns],
+        'label_column': None if label_column is None else str(label_column),
+        'n_rows': n_rows,
+        'n_components': calculator.get_n_components(),
+        'solver': calculator.get_solver(),
+        'mean': [float(value) for value in calculator.mean],
+        'scale': [float(value) for value in calculator.scale],
+        'explained_variance': [float(value) for value in calculator.explained_variance],
+        'explained_variance_ratio': [float(value) for value in calculator.get_explained_variance_ratio()],
+    }
+    if calculator.kernel_map is not None:
+        metadata['kernel'] = {'name': calculator.kernel_map.kernel, 'n_landmarks': len(calculator.kernel_map.landmarks),
+                              **calculator.kernel_map.get_params()}
+    return metadata
+
+def _require_pyarrow(fmt):
+    if pyarrow is None:
+        raise ImportError(f"Writing {fmt} files requires pyarrow (pip install pyarrow)")
+
+def _schema_metadata(metadata):
+    return {METADATA_KEY: json.dumps(metadata)}
+
+def _open_writer(file_name, fmt, schema):
+    # Parquet or Feather (Arrow IPC file) writer taking one record batch at a time
+    if fmt == 'parquet':
+        return pa_parquet.ParquetWriter(file_name, schema)
+    return pa_ipc.new_file(file_name, schema)
+
+def write_scores(file_name, scores, labels=None, fmt='parquet', metadata=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    # Returns every file written (npy adds the labels and the metadata sidecar)
+    names = [f"PC{i+1}" for i in range(scores.shape[1])]
+    if fmt == 'npy':
+        written = [file_name]
+        out = open_memmap(file_name, mode='w+', dtype=scores.dtype, shape=scores.shape)
+        for start in range(0, scores.shape[0], chunk_rows):
+            out[start:start + chunk_rows] = scores[start:start + chunk_rows]
+        out.flush()
+        del out
+        if labels is not None:
+            labels_file = f"{splitext(file_name)[0]}_labels.npy"
+            if hasattr(labels, 'categories'):
+                # Categorical: convert each category once and index by code (-1, missing, maps to 'nan')
+                labels = append(asarray(labels.categories.astype(str)), 'nan')[labels.codes]
+            labels = asarray(labels)
+            # Object arrays would need pickle to load; strings are saved as fixed-width text
+            np_save(labels_file, labels.astype(str) if labels.dtype.kind == 'O' else labels, allow_pickle=False)
+            written.append(labels_file)
+        return written
+
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {EXPORT_FORMATS}")
+    _require_pyarrow(fmt)
+    # Labels are converted once, so every batch shares one type
+    label_array = pyarrow.array(labels, from_pandas=True) if labels is not None else None
+    fields = [pyarrow.field(name, pyarrow.from_numpy_dtype(scores.dtype)) for name in names]
+    if label_array is not None:
+        fields.append(pyarrow.field('label', label_array.type))
+    schema = pyarrow.schema(fields, metadata=_schema_metadata(metadata or {}))
+
+    writer = _open_writer(file_name, fmt, schema)
+    try:
+        for start in range(0, scores.shape[0], chunk_rows):
+            # Column-major copy of the chunk: each PC column is then a contiguous buffer Arrow wraps as is
+            chunk = asfortranarray(scores[start:start + chunk_rows])
+            arrays = [pyarrow.array(chunk[:, j]) for j in range(chunk.shape[1])]
+            if label_array is not None:
+                arrays.append(label_array.slice(start, chunk.shape[0]))
+            writer.write_batch(pyarrow.RecordBatch.from_arrays(arrays, schema=schema))
+    finally:
+        writer.close()
+    return [file_name]
+
+def write_table(file_name, table, fmt='parquet', metadata=None):
+    # Small named-column table (loadings, explained variance); npy stores the numeric columns as a
+    # 2-D array, with the column names in the metadata sidecar
+    if fmt == 'npy':
+        numeric = {name: values for name, values in table.items() if asarray(values).dtype.kind in 'fiu'}
+        np_save(file_name, column_stack(list(numeric.values())), allow_pickle=False)
+        return [file_name]
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {EXPORT_FORMATS}")
+    _require_pyarrow(fmt)
+    arrow_table = pyarrow.table({name: asarray(values) for name, values in table.items()})
+    arrow_table = arrow_table.replace_schema_metadata(_schema_metadata(metadata or {}))
+    writer = _open_writer(file_name, fmt, arrow_table.schema)
+    try:
+        for batch in arrow_table.to_batches():
+            writer.write_batch(batch)
+    finally:
+        writer.close()
+    return [file_name]
+
+def export_results(calculator, scores, columns, prefix, fmt='parquet', labels=None, label_column=None,
+                   chunk_rows=EXPORT_CHUNK_ROWS):
+    # Writes <prefix>_scores, <prefix>_loadings and <prefix>_explained_variance; returns the paths
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {EXPORT_FORMATS}")
+    extension = EXTENSIONS[fmt]
+    metadata = build_metadata(calculator, columns, label_column, scores.shape[0])
+    names = [f"PC{i+1}" for i in range(calculator.get_n_components())]
+    written = {}
+
+    written['scores'] = write_scores(f"{prefix}_scores{extension}", scores, labels, fmt, metadata, chunk_rows)
+    if calculator.kernel_map is None:
+        # Kernel PCA components live in the landmark feature space and have no per-column loadings
+        loadings = {'column': [str(column) for column in columns]}
+        loadings.update({name: calculator.get_components()[i] for i, name in enumerate(names)})
+        written['loadings'] = write_table(f"{prefix}_loadings{extension}", loadings, fmt, metadata)
+    written['explained_variance'] = write_table(f"{prefix}_explained_variance{extension}", {
+        'component': names,
+        'explained_variance': calculator.explained_variance,
+        'explained_variance_ratio': calculator.get_explained_variance_ratio(),
+    }, fmt, metadata)
+
+    if fmt == 'npy':
+        sidecar = f"{prefix}_metadata.json"
+        metadata['files'] = {
+            'scores': names,
+            'loadings': {'rows': metadata['columns'], 'columns': names} if 'loadings' in written else None,
+            'explained_variance': {'rows': names, 'columns': ['explained_variance', 'explained_variance_ratio']},
+        }
+        with open(sidecar, 'w') as f:
+            json.dump(metadata, f, indent=2)
+        written['metadata'] = [sidecar]
+    return written
+
+def read_metadata(file_name):
+    # Fit metadata of an exported Parquet or Feather file
+    _require_pyarrow("Parquet/Feather")
+    if file_name.lower().endswith(('.parquet', '.pq')):
+        schema = pa_parquet.read_schema(file_name)
+    else:
+        schema = pa_ipc.open_file(pyarrow.memory_map(file_name)).schema
+    raw = (schema.metadata or {}).get(METADATA_KEY.encode())
+    return json.loads(raw) if raw is not None else None
@@ -1,63 +1,216 @@
 import sys
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QLabel, QPushButton, QFileDialog, QTableView, QStyledItemDelegate,
-                             QListWidget, QSplitter, QLineEdit, QListWidgetItem, QAbstractItemView,
-                             QRadioButton, QButtonGroup, QDialog)
-from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QMimeData
+                             QListWidget, QListView, QSplitter, QLineEdit, QListWidgetItem, QAbstractItemView,
+                             QRadioButton, QButtonGroup, QDialog, QComboBox, QProgressBar, QHeaderView,
+                             QCheckBox, QSpinBox, QDoubleSpinBox)
+from PyQt6.QtCore import Qt, QAbstractTableModel, QAbstractListModel, QModelIndex, QMimeData, QTimer, pyqtSignal
 from PyQt6.QtGui import QColor, QBrush, QDrag
-from pandas import read_csv, DataFrame
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from collections import OrderedDict
+from os import environ
 from .pca_interface import PCAInterface
-from .pca_visualizer import PCAVisualizer
+from .pca_calc import SOLVERS, KERNELS, N_LANDMARKS
+from .pca_worker import TaskRunner
+from .pca_instrument import Instrumentation, LOG_FILE_ENV
+from .pca_loaders import open_source, FILE_FILTER
+
+SELECTED_BRUSH = QBrush(QColor(200, 200, 255))
+LABEL_BRUSH = QBrush(QColor(255, 200, 200))  # Light red for label column
+MODEL_FILTER = "PCA Models (*.npz);;All Files (*)"
+FILTER_DELAY_MS = 150  # Search waits for a pause in typing before filtering
+
+def contiguous_runs(positions):
+    # Sorted positions as (first, last) spans of consecutive values
+    runs = []
+    for position in positions:
+        if runs and position == runs[-1][1] + 1:
+            runs[-1][1] = position
+        else:
+            runs.append([position, position])
+    return runs
 
 class SelectableHeaderModel(QAbstractTableModel):
-    def __init__(self, data):
+    # (added, removed) actual columns, in the order they were applied
+    selectionChanged = pyqtSignal(object, object)
+
+    def __init__(self, data, block_rows=256, max_cached_blocks=2048):
         super().__init__()
         self._data = data
         self.selected_columns = set()
         self._filtered_columns = list(range(self._data.shape[1]))
+        self._filtered_positions = {column: i for i, column in enumerate(self._filtered_columns)}
         self.label_column = None
 
+        # One NumPy array per column, taken when the column is first drawn (wide frames have far more
+        # columns than are ever on screen); display strings are formatted a block of rows at a time
+        self._columns = {}
+        self._header_names = [str(column) for column in self._data.columns]
+        # Case-folded once, so filtering is a substring test per name and nothing else
+        self._folded_names = [name.casefold() for name in self._header_names]
+        self._filter_text = ''
+        self._block_rows = block_rows
+        self._max_cached_blocks = max_cached_blocks
+        self._display_blocks = OrderedDict()
+
     def rowCount(self, parent=QModelIndex()):
         return self._data.shape[0]
 
     def columnCount(self, parent=QModelIndex()):
         return len(self._filtered_columns)
 
+    def _display_block(self, column, block):
+        key = (column, block)
+        strings = self._display_blocks.get(key)
+        if strings is not None:
+            self._display_blocks.move_to_end(key)
+            return strings
+
+        values = self._columns.get(column)
+        if values is None:
+            values = self._columns[column] = self._data.iloc[:, column].to_numpy()
+        start = block * self._block_rows
+        values = values[start:start + self._block_rows]
+        if values.dtype.kind in 'Mm':
+            strings = self._data.iloc[start:start + self._block_rows, column].astype(str).tolist()
+        else:
+            strings = values.astype(str).tolist()
+
+        self._display_blocks[key] = strings
+        if len(self._display_blocks) > self._max_cached_blocks:
+            self._display_blocks.popitem(last=False)
+        return strings
+
     def data(self, index, role=Qt.ItemDataRole.DisplayRole):
         if role == Qt.ItemDataRole.DisplayRole:
-            return str(self._data.iloc[index.row(), self._filtered_columns[index.column()]])
+            row = index.row()
+            return self._display_block(self._filtered_columns[index.column()], row // self._block_rows)[row % self._block_rows]
         elif role == Qt.ItemDataRole.BackgroundRole:
             if self._filtered_columns[index.column()] in self.selected_columns:
-                return QBrush(QColor(200, 200, 255))
+                return SELECTED_BRUSH
         return None
 
     def headerData(self, section, orientation, role):
         if orientation == Qt.Orientation.Horizontal:
             if role == Qt.ItemDataRole.DisplayRole:
-                return str(self._data.columns[self._filtered_columns[section]])
+                return self._header_names[self._filtered_columns[section]]
             elif role == Qt.ItemDataRole.BackgroundRole:
                 if self._filtered_columns[section] == self.label_column:
-                    return QBrush(QColor(255, 200, 200))  # Light red for label column
+                    return LABEL_BRUSH
         return None
 
+    def refresh_columns(self, columns=None):
+        # Repaint only the given actual columns (all visible ones if None or many) instead of resetting the layout
+        if columns is None or len(columns) > 64:
+            spans = [(0, len(self._filtered_columns) - 1)] if self._filtered_columns else []
+        else:
+            positions = (self._filtered_positions.get(column) for column in columns)
+            spans = contiguous_runs(sorted(position for position in positions if position is not None))
+
+        roles = [Qt.ItemDataRole.BackgroundRole]
+        for first, last in spans:
+            if self.rowCount() > 0:
+                self.dataChanged.emit(self.index(0, first), self.index(self.rowCount() - 1, last), roles)
+            self.headerDataChanged.emit(Qt.Orientation.Horizontal, first, last)
+
+    def select_columns(self, columns):
+        added = [column for column in columns if column not in self.selected_columns and column != self.label_column]
+        self.selected_columns.update(added)
+        if added:
+            self.refresh_columns(added)
+            self.selectionChanged.emit(added, [])
+
+    def deselect_columns(self, columns):
+        removed = [column for column in columns if column in self.selected_columns]
+        self.selected_columns.difference_update(removed)
+        if removed:
+            self.refresh_columns(removed)
+            self.selectionChanged.emit([], removed)
+
     def toggle_column_selection(self, column):
         actual_column = self._filtered_columns[column]
         if actual_column == self.label_column:
             return  # Prevent reselection of label column
         if actual_column in self.selected_columns:
-            self.selected_columns.remove(actual_column)
+            self.deselect_columns([actual_column])
         else:
-            self.selected_columns.add(actual_column)
-        self.layoutChanged.emit()
+            self.select_columns([actual_column])
 
     def filter_columns(self, filter_text):
-        self._filtered_columns = [
-            i for i, col in enumerate(self._data.columns)
-            if filter_text.lower() in col.lower()
-        ]
+        text = filter_text.casefold()
+        if text == self._filter_text:
+            return
+        names = self._folded_names
+        if not text:
+            filtered = list(range(len(names)))
+        elif self._filter_text in text:
+            # Narrowing the search: only names that matched the shorter text can still match
+            filtered = [column for column in self._filtered_columns if text in names[column]]
+        else:
+            filtered = [column for column, name in enumerate(names) if text in name]
+        self._filter_text = text
+        if filtered == self._filtered_columns:
+            return
+
+        self.layoutAboutToBeChanged.emit()
+        self._filtered_columns = filtered
+        self._filtered_positions = {column: i for i, column in enumerate(self._filtered_columns)}
         self.layoutChanged.emit()
 
+class SelectedColumnsModel(QAbstractListModel):
+    # The ordered selection; changes arrive as diffs, so a large selection is never rebuilt
+    def __init__(self, names, parent=None):
+        super().__init__(parent)
+        self._names = names
+        self.columns = []
+        self._positions = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and index.isValid():
+            return self._names[self.columns[index.row()]]
+        return None
+
+    def _reindex(self, start=0):
+        for row in range(start, len(self.columns)):
+            self._positions[self.columns[row]] = row
+
+    def apply_changes(self, added, removed):
+        if removed:
+            rows = sorted(self._positions.pop(column) for column in removed if column in self._positions)
+            runs = contiguous_runs(rows)
+            if len(runs) > 64:
+                # Scattered removals: one reset is cheaper than a signal per run
+                self.beginResetModel()
+                keep = set(self._positions)
+                self.columns = [column for column in self.columns if column in keep]
+                self.endResetModel()
+            else:
+                for first, last in reversed(runs):
+                    self.beginRemoveRows(QModelIndex(), first, last)
+                    del self.columns[first:last + 1]
+                    self.endRemoveRows()
+            if rows:
+                self._reindex(rows[0] if len(runs) <= 64 else 0)
+        if added:
+            first = len(self.columns)
+            self.beginInsertRows(QModelIndex(), first, first + len(added) - 1)
+            self.columns.extend(added)
+            self.endInsertRows()
+            self._reindex(first)
+
+    def move_row(self, row, target):
+        # Moves `row` so it ends up just before what is currently at `target`
+        if row < 0 or target in (row, row + 1):
+            return False
+        self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), target)
+        column = self.columns.pop(row)
+        self.columns.insert(target - 1 if target > row else target, column)
+        self.endMoveRows()
+        self._reindex(min(row, target))
+        return True
+
 class DraggableTableView(QTableView):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -84,12 +237,16 @@ class ColumnSelectDelegate(QStyledItemDelegate):
             painter.fillRect(option.rect, QColor(200, 200, 255))
         super().paint(painter, option, index)
 
-class DraggableListWidget(QListWidget):
+class SelectedColumnsView(QListView):
     def __init__(self, parent=None):
         super().__init__(parent)
+        # Uniform rows: the view only creates and measures the rows on screen
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.LayoutMode.Batched)
+        self.setBatchSize(1000)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
         self.setDragEnabled(True)
         self.setAcceptDrops(True)
-        self.setDropIndicatorShown(True)
 
     def dragEnterEvent(self, event):
         if event.source() == self:
@@ -105,20 +262,26 @@ class DraggableListWidget(QListWidget):
             event.ignore()
 
     def dropEvent(self, event):
-        if event.source() == self:
+        if event.source() == self and self.model() is not None:
+            # Reordering is a single row move in the model
+            position = event.position().toPoint()
+            index = self.indexAt(position)
+            target = self.model().rowCount()
+            if index.isValid():
+                target = index.row() + (1 if position.y() > self.visualRect(index).center().y() else 0)
+            self.model().move_row(self.currentIndex().row(), target)
             event.setDropAction(Qt.DropAction.MoveAction)
-            super().dropEvent(event)
             event.accept()
         else:
             event.ignore()
 
     def mouseMoveEvent(self, event):
         if event.buttons() == Qt.MouseButton.LeftButton:
-            item = self.currentItem()
-            if item:
+            index = self.currentIndex()
+            if index.isValid():
                 drag = QDrag(self)
                 mime_data = QMimeData()
-                mime_data.setText(item.text())
+                mime_data.setText(index.data())
                 drag.setMimeData(mime_data)
                 drag.exec(Qt.DropAction.MoveAction)
 
@@ -167,9 +330,11 @@ class PCAPlotWindow(QDialog):
         super().__init__(parent)
         self.setWindowTitle("PCA Plot")
         self.setGeometry(100, 100, 1000, 600)
+        # matplotlib's Qt backend is only imported once a plot is shown
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
         layout = QVBoxLayout()
-        canvas = FigureCanvas(figure)
-        layout.addWidget(canvas)
+        self.canvas = FigureCanvas(figure)
+        layout.addWidget(self.canvas)
         self.setLayout(layout)
         
 class PCACalculatorApp(QMainWindow):
@@ -183,9 +348,11 @@ class PCACalculatorApp(QMainWindow):
         self.layout = QVBoxLayout(self.central_widget)
 
         self.df = None
-        self.pca_interface = PCAInterface()
+        self.source = None
+        self.instrumentation = Instrumentation(track_memory=True, log_file=environ.get(LOG_FILE_ENV))
+        self.pca_interface = PCAInterface(instrumentation=self.instrumentation)
         self.pca_visualizer = None
-        self.last_pca_columns = None
+        self.task_runner = TaskRunner(self)
         self.setup_ui()
 
     def setup_ui(self):
@@ -201,13 +368,19 @@ class PCACalculatorApp(QMainWindow):
         # Search bar
         self.search_bar = QLineEdit()
         self.search_bar.setPlaceholderText("Search columns...")
-        self.search_bar.textChanged.connect(self.filter_columns)
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(FILTER_DELAY_MS)
+        self.filter_timer.timeout.connect(lambda: self.filter_columns(self.search_bar.text()))
+        self.search_bar.textChanged.connect(self.filter_timer.start)
         self.layout.addWidget(self.search_bar)
 
         splitter = QSplitter(Qt.Orientation.Horizontal)
 
         # Data view
         self.table_view = DraggableTableView()
+        # Fixed row heights so the view never measures rows on very long tables
+        self.table_view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
         self.table_view.horizontalHeader().sectionClicked.connect(self.toggle_column_selection)
         splitter.addWidget(self.table_view)
 
@@ -216,9 +389,8 @@ class PCACalculatorApp(QMainWindow):
         right_layout = QVBoxLayout(right_widget)
 
         # Selected columns view
-        self.selected_columns_list = DraggableListWidget()
+        self.selected_columns_list = SelectedColumnsView()
         self.selected_columns_list.setMaximumWidth(250)
-        self.selected_columns_list.model().rowsMoved.connect(self.update_column_order)
         right_layout.addWidget(QLabel("Selected Columns:"))
         right_layout.addWidget(self.selected_columns_list)
 
@@ -255,6 +427,28 @@ class PCACalculatorApp(QMainWindow):
         dimension_layout.addWidget(QLabel("Select visualization dimension:"))
         dimension_layout.addWidget(self.radio_2d)
         dimension_layout.addWidget(self.radio_3d)
+        dimension_layout.addWidget(QLabel("Solver:"))
+        self.solver_selector = QComboBox()
+        self.solver_selector.addItems(SOLVERS)
+        dimension_layout.addWidget(self.solver_selector)
+        self.low_memory_checkbox = QCheckBox("Low memory (float32)")
+        self.low_memory_checkbox.setToolTip("Fit in float32 and report the peak memory of the fit. Tall data (10+ rows per "
+                                            "column) is fitted from column moments whatever the solver; the SVD "
+                                            "solvers need 2-4x the input")
+        dimension_layout.addWidget(self.low_memory_checkbox)
+        dimension_layout.addWidget(QLabel("Kernel:"))
+        self.kernel_selector = QComboBox()
+        self.kernel_selector.addItems(('linear',) + KERNELS)
+        self.kernel_selector.setToolTip("Non-linear kernels run approximate kernel PCA on a sample of landmark rows")
+        self.kernel_selector.currentTextChanged.connect(self.update_kernel_options)
+        dimension_layout.addWidget(self.kernel_selector)
+        dimension_layout.addWidget(QLabel("Landmarks:"))
+        self.landmarks_spinbox = QSpinBox()
+        self.landmarks_spinbox.setRange(10, 20_000)
+        self.landmarks_spinbox.setSingleStep(100)
+        self.landmarks_spinbox.setValue(N_LANDMARKS)
+        self.landmarks_spinbox.setEnabled(False)
+        dimension_layout.addWidget(self.landmarks_spinbox)
         self.layout.addLayout(dimension_layout)
 
         # Analyze buttons
@@ -265,16 +459,90 @@ class PCACalculatorApp(QMainWindow):
         self.visualize_button.clicked.connect(self.visualize)
         analysis_layout.addWidget(self.analyze_button)
         analysis_layout.addWidget(self.visualize_button)
+        self.suggest_button = QPushButton("Suggest Components")
+        self.suggest_button.setToolTip("Parallel analysis and cross-validation of the selected columns")
+        self.suggest_button.clicked.connect(self.suggest_components)
+        analysis_layout.addWidget(self.suggest_button)
         self.layout.addLayout(analysis_layout)
 
+        # Saved models: score new data with a reference fit instead of refitting
+        model_layout = QHBoxLayout()
+        self.save_model_button = QPushButton("Save Model")
+        self.save_model_button.clicked.connect(self.save_model)
+        self.load_model_button = QPushButton("Load Model")
+        self.load_model_button.clicked.connect(self.load_model)
+        self.score_button = QPushButton("Score Data With Model")
+        self.score_button.clicked.connect(self.score_with_model)
+        model_layout.addWidget(self.save_model_button)
+        model_layout.addWidget(self.load_model_button)
+        model_layout.addWidget(self.score_button)
+        self.error_button = QPushButton("Reconstruction Error")
+        self.error_button.setToolTip("Per-row reconstruction error of the loaded data under the current model, worst rows first")
+        self.error_button.clicked.connect(self.score_reconstruction)
+        model_layout.addWidget(self.error_button)
+        self.append_button = QPushButton("Append Data")
+        self.append_button.setToolTip("Fold the rows of another file into the current model without refitting the history")
+        self.append_button.clicked.connect(self.append_data)
+        model_layout.addWidget(self.append_button)
+        self.export_button = QPushButton("Export Results")
+        self.export_button.setToolTip("Write scores, loadings and explained variance as Parquet, Feather or NumPy files")
+        self.export_button.clicked.connect(self.export_results)
+        model_layout.addWidget(self.export_button)
+        model_layout.addWidget(QLabel("Forgetting:"))
+        self.forgetting_spinbox = QDoubleSpinBox()
+        self.forgetting_spinbox.setRange(0.01, 1.0)
+        self.forgetting_spinbox.setSingleStep(0.05)
+        self.forgetting_spinbox.setValue(1.0)
+        self.forgetting_spinbox.setToolTip("Weight kept by earlier rows at each append; below 1 the model follows drift")
+        model_layout.addWidget(self.forgetting_spinbox)
+        self.layout.addLayout(model_layout)
+
+        # Background task status
+        task_layout = QHBoxLayout()
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 0)  # Busy indicator, stages have no known length
+        self.progress_bar.hide()
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_task)
+        task_layout.addWidget(self.progress_bar)
+        task_layout.addWidget(self.cancel_button)
+        self.layout.addLayout(task_layout)
+
         self.results_label = QLabel("PCA Information and Results")
         self.layout.addWidget(self.results_label)
 
+        self.task_runner.started.connect(self.task_started)
+        self.task_runner.progress.connect(self.results_label.setText)
+        self.task_runner.idle.connect(self.task_idle)
+
+    def task_started(self, description):
+        self.results_label.setText(description)
+        self.progress_bar.show()
+        self.cancel_button.setEnabled(True)
+
+    def task_idle(self):
+        self.progress_bar.hide()
+        self.cancel_button.setEnabled(False)
+
+    def cancel_task(self):
+        if self.task_runner.is_busy():
+            self.task_runner.cancel()
+            self.results_label.setText("Cancelled")
+
+    def show_task_error(self, message):
+        self.results_label.setText(f"PCA calculation failed: {message}")
+
+    def update_kernel_options(self, kernel):
+        is_kernel = kernel != 'linear'
+        self.landmarks_spinbox.setEnabled(is_kernel)
+        self.solver_selector.setEnabled(not is_kernel)
+
     def update_n_components(self, button):
         self.n_components = 3 if button.text() == "3D" else 2
 
     def select_file(self):
-        file_name, _ = QFileDialog.getOpenFileName(self, "Select Data File", "", "CSV Files (*.csv);;All Files (*)")
+        file_name, _ = QFileDialog.getOpenFileName(self, "Select Data File", "", FILE_FILTER)
         if file_name:
             self.file_label.setText(file_name)
             self.load_data(file_name)
@@ -289,32 +557,47 @@ class PCACalculatorApp(QMainWindow):
 
             model = self.table_view.model()
             if isinstance(model, SelectableHeaderModel):
-                if model.label_column is not None:
-                    model.selected_columns.add(model.label_column)
+                old_label_column = model.label_column
+                new_label_column = None
                 if self.label_drop_area.count() > 0:
                     new_label_column = self.df.columns.get_loc(self.label_drop_area.item(0).text())
-                    model.label_column = new_label_column
-                    model.selected_columns.discard(new_label_column)
-                else:
-                    model.label_column = None
-                model.layoutChanged.emit()
-                self.update_selected_columns_list()
+                model.label_column = None
+                if old_label_column is not None and old_label_column != new_label_column:
+                    model.select_columns([old_label_column])
+                if new_label_column is not None:
+                    model.deselect_columns([new_label_column])
+                model.label_column = new_label_column
+                model.refresh_columns([c for c in (old_label_column, model.label_column) if c is not None])
         else:
             event.ignore()
 
 
     def load_data(self, file_name):
-        try:
-            self.df = read_csv(file_name)
-            model = SelectableHeaderModel(self.df)
-            self.table_view.setModel(model)
-            delegate = ColumnSelectDelegate(self.table_view)
-            self.table_view.setItemDelegate(delegate)
-            self.update_selected_columns_list()
-            
-            self.label_drop_area.dropEvent = self.label_drop_event
-        except Exception as e:
-            self.results_label.setText(f"Error loading file: {str(e)}")
+        # Only the schema and a preview are read here; full columns are read when PCA needs them
+        def load(token, progress):
+            return open_source(file_name)
+
+        self.task_runner.submit(f"Loading {file_name}...", load, self.show_data, self.show_load_error)
+
+    def show_data(self, source):
+        self.source = source
+        self.df = source.preview
+        model = SelectableHeaderModel(self.df)
+        self.table_view.setModel(model)
+        delegate = ColumnSelectDelegate(self.table_view)
+        self.table_view.setItemDelegate(delegate)
+        selected_model = SelectedColumnsModel(model._header_names, model)
+        model.selectionChanged.connect(selected_model.apply_changes)
+        self.selected_columns_list.setModel(selected_model)
+        self.filter_timer.stop()
+        model.filter_columns(self.search_bar.text())
+
+        self.label_drop_area.dropEvent = self.label_drop_event
+        rows = f"{source.n_rows:,} rows" if source.n_rows is not None else "rows"
+        self.results_label.setText(f"Loaded {len(source.columns)} columns, showing the first {len(self.df):,} of {rows}")
+
+    def show_load_error(self, message):
+        self.results_label.setText(f"Error loading file: {message}")
 
     def toggle_column_selection(self, logical_index):
         model = self.table_view.model()
@@ -322,29 +605,18 @@ class PCACalculatorApp(QMainWindow):
             actual_column = model._filtered_columns[logical_index]
             if actual_column == model.label_column:
                 self.label_drop_area.clear()
-                model.selected_columns.add(model.label_column)
                 model.label_column = None
+                model.select_columns([actual_column])
+                model.refresh_columns([actual_column])
             else:
                 model.toggle_column_selection(logical_index)
-            model.layoutChanged.emit()
-            self.update_selected_columns_list()
-        self.last_pca_columns = None
-
-    def update_selected_columns_list(self):
-        self.selected_columns_list.clear()
-        model = self.table_view.model()
-        if isinstance(model, SelectableHeaderModel) and self.df is not None:
-            selected_column_names = [self.df.columns[i] for i in sorted(model.selected_columns)]
-            self.selected_columns_list.addItems(selected_column_names)
-        self.last_pca_columns = None
-
 
-    def update_column_order(self):
-        new_order = [self.selected_columns_list.item(i).text() for i in range(self.selected_columns_list.count())]
-        model = self.table_view.model()
-        if isinstance(model, SelectableHeaderModel) and self.df is not None:
-            model.selected_columns = set(self.df.columns.get_loc(col) for col in new_order)
-            model.layoutChanged.emit()
+    def get_selected_columns(self):
+        # Column names in the order shown in the selected-columns list
+        selected_model = self.selected_columns_list.model()
+        if self.df is None or not isinstance(selected_model, SelectedColumnsModel):
+            return []
+        return [self.df.columns[i] for i in selected_model.columns]
 
     def filter_columns(self, filter_text):
         model = self.table_view.model()
@@ -354,58 +626,93 @@ class PCACalculatorApp(QMainWindow):
     def select_all_columns(self):
         model = self.table_view.model()
         if isinstance(model, SelectableHeaderModel):
-            model.selected_columns = set(range(self.df.shape[1])) - {model.label_column}
-            model.layoutChanged.emit()
-            self.update_selected_columns_list()
+            model.select_columns(range(self.df.shape[1]))
 
     def deselect_all_columns(self):
         model = self.table_view.model()
         if isinstance(model, SelectableHeaderModel):
-            model.selected_columns.clear()
+            model.deselect_columns(self.selected_columns_list.model().columns)
             if model.label_column is not None:
                 self.label_drop_area.clear()
-                model.label_column = None
-            model.layoutChanged.emit()
-            self.update_selected_columns_list()
+                label_column, model.label_column = model.label_column, None
+                model.refresh_columns([label_column])
 
-    def run_pca(self, n_components=None):
+    def get_pca_request(self, n_components):
+        # Validate the current selection on the GUI thread; returns (columns, label) or None
         if self.df is None:
             self.results_label.setText("No data loaded")
-            return False
+            return None
 
         model = self.table_view.model()
         if not isinstance(model, SelectableHeaderModel):
             self.results_label.setText("Invalid data model")
-            return False
+            return None
 
-        selected_column_names = [self.df.columns[i] for i in model.selected_columns]
+        selected_column_names = self.get_selected_columns()
         if not selected_column_names:
             self.results_label.setText("No columns selected for analysis")
-            return False
-
-        n_components = 3 if self.radio_3d.isChecked() else 2
+            return None
 
         if len(selected_column_names) < n_components:
             self.results_label.setText(f"Not enough columns selected. Please select at least {n_components} columns for {n_components}D PCA.")
-            return False
+            return None
 
         label_column = self.label_drop_area.item(0).text() if self.label_drop_area.count() > 0 else None
-        
-        self.pca_interface.load_data(self.df, selected_column_names, label_column)
-        results = self.pca_interface.run_pca(n_components)
-        
+        return selected_column_names, label_column
+
+    def make_pca_task(self, n_components, selected_column_names, label_column):
+        source = self.source
+        solver = self.solver_selector.currentText()
+        low_memory = self.low_memory_checkbox.isChecked()
+        kernel = self.kernel_selector.currentText()
+        kernel = None if kernel == 'linear' else kernel
+        n_landmarks = self.landmarks_spinbox.value()
+
+        def fit(token, progress):
+            # One breakdown per run: reading, fitting and (when visualizing) plotting
+            self.instrumentation.reset()
+            progress(f"Reading {len(selected_column_names)} columns...")
+            with self.instrumentation.span('read_columns'):
+                df = source.load_columns(selected_column_names + ([label_column] if label_column else []), progress)
+            token.check()
+            progress("Running PCA...")
+            self.pca_interface.low_memory = low_memory
+            self.pca_interface.track_memory = low_memory
+            self.pca_interface.load_data(df, selected_column_names, label_column)
+            results = self.pca_interface.run_pca(n_components, solver, kernel, n_landmarks)
+            token.check()
+            return results
+
+        return fit
+
+    def run_pca(self, n_components=None):
+        n_components = 3 if self.radio_3d.isChecked() else 2
+        request = self.get_pca_request(n_components)
+        if request is None:
+            return False
+
+        self.task_runner.submit("Running PCA...", self.make_pca_task(n_components, *request),
+                                self.show_pca_results, self.show_task_error)
+        return True
+
+    def show_pca_results(self, results):
         if results is None or 'n_components' not in results or 'explained_variance_ratio' not in results:
             self.results_label.setText("PCA calculation failed. Please check your data and try again.")
             return False
 
         analysis_text = f"PCA completed.\n"
         analysis_text += f"Number of components: {results['n_components']}\n"
-        analysis_text += f"Explained variance ratio: {[f'{var:.4f}' for var in results['explained_variance_ratio']]}"
-        
+        analysis_text += f"Explained variance ratio: {[f'{var:.4f}' for var in results['explained_variance_ratio']]}\n"
+        analysis_text += f"Solver: {results['solver']} ({results['fit_time']:.3f}s{', cached' if results['cached'] else ''})"
+        if results.get('peak_memory') is not None:
+            analysis_text += f"\nPeak memory during fit: {results['peak_memory'] / 1024 ** 2:.1f} MB"
+            if results.get('input_bytes'):
+                analysis_text += f" ({results['peak_memory'] / results['input_bytes']:.2f}x input)"
+        breakdown = self.instrumentation.format_breakdown(max_depth=2)
+        if breakdown:
+            analysis_text += f"\n\nStages:\n{breakdown}"
+
         self.results_label.setText(analysis_text)
-        
-        self.pca_visualizer = PCAVisualizer(self.pca_interface)
-        self.last_pca_columns = set(selected_column_names)
         return True
 
     def visualize(self):
@@ -417,24 +724,271 @@ class PCACalculatorApp(QMainWindow):
             self.results_label.setText("Invalid data model")
             return
 
-        current_columns = set([self.df.columns[i] for i in model.selected_columns])
+        current_columns = self.get_selected_columns()
         
         if len(current_columns) < n_components:
             self.results_label.setText(f"Insufficient data for visualization. Select at least {n_components} columns for {n_components}D PCA visualization.")
             return
 
-        # Check if columns have changed or if PCA hasn't been run yet
-        if self.pca_visualizer is None or self.last_pca_columns != current_columns or self.pca_interface.pca_calculator.get_n_components() != n_components:
-            if not self.run_pca(n_components):
-                return
+        request = self.get_pca_request(n_components)
+        if request is None:
+            return
+        fit = self.make_pca_task(n_components, *request)
+
+        def plot(token, progress):
+            # Served from the interface's result cache unless columns, label or solver changed
+            results = fit(token, progress)
+            progress("Rendering plot...")
+            # matplotlib is imported on the worker thread the first time a plot is drawn
+            from .pca_visualizer import PCAVisualizer
+            self.pca_visualizer = PCAVisualizer(self.pca_interface)
+            figure, variance_text = self.pca_visualizer.visualize(is_3d)
+            token.check()
+            return results, figure, variance_text
+
+        self.task_runner.submit("Running PCA...", plot, self.show_visualization, self.show_task_error)
+
+    def suggest_components(self):
+        request = self.get_pca_request(2)
+        if request is None:
+            return
+        selected_column_names, label_column = request
+        source = self.source
+
+        def select(token, progress):
+            progress(f"Reading {len(selected_column_names)} columns...")
+            df = source.load_columns(selected_column_names, progress)
+            token.check()
+            self.pca_interface.load_data(df, selected_column_names, label_column)
+            return self.pca_interface.select_rank(progress=progress)
+
+        self.task_runner.submit("Selecting the number of components...", select, self.show_rank, self.show_task_error)
+
+    def show_rank(self, result):
+        pa = result['parallel_analysis']
+        cv = result['cross_validation']
+        low, high = cv['rank_range']
+        text = f"Recommended number of components: {result['recommended_rank']}\n"
+        text += f"Parallel analysis ({pa['quantile']:.0%} of {pa['n_permutations']} permutations): {pa['rank']}\n"
+        text += f"Cross-validation ({cv['n_folds']} folds, one standard error rule): {cv['rank']}"
+        text += f" (within one SE: {low}-{high})\n" if high > low else "\n"
+        text += f"\nPC  eigenvalue  null {pa['quantile']:.0%} band      CV error\n"
+        for k in range(min(result['max_components'], max(result['recommended_rank'], high) + 3)):
+            text += (f"{k + 1:<3} {pa['eigenvalues'][k]:10.3f}  {pa['null_lower'][k]:.3f}-{pa['null_upper'][k]:.3f}"
+                     f"  {cv['press_mean'][k + 1]:8.4f} +/- {cv['press_se'][k + 1]:.4f}\n")
+        self.results_label.setText(text)
+
+    def save_model(self):
+        if self.pca_interface.model_columns is None:
+            self.results_label.setText("Run PCA or load a model before saving")
+            return
+        file_name, _ = QFileDialog.getSaveFileName(self, "Save PCA Model", "", MODEL_FILTER)
+        if not file_name:
+            return
+
+        # A task like any other, so it runs after (and supersedes) whatever is in flight
+        def save(token, progress):
+            self.pca_interface.save_model(file_name)
+            return file_name
+
+        self.task_runner.submit("Saving the model...", save,
+                                lambda saved: self.results_label.setText(f"Model saved to {saved}"),
+                                lambda message: self.results_label.setText(f"Saving the model failed: {message}"))
+
+    def load_model(self):
+        file_name, _ = QFileDialog.getOpenFileName(self, "Load PCA Model", "", MODEL_FILTER)
+        if not file_name:
+            return
 
-        figure, variance_text = self.pca_visualizer.visualize(is_3d)
+        # Supersedes an in-flight run or append: that task finishes first on the single worker thread
+        # and its result is dropped, so it cannot replace the loaded model afterwards
+        def load(token, progress):
+            return file_name, self.pca_interface.load_model(file_name)
+
+        self.task_runner.submit("Loading the model...", load, self.show_loaded_model,
+                                lambda message: self.results_label.setText(f"Loading the model failed: {message}"))
+
+    def show_loaded_model(self, result):
+        file_name, columns = result
+        self.results_label.setText(
+            f"Loaded model from {file_name}: {self.pca_interface.pca_calculator.get_n_components()} components "
+            f"over {len(columns)} columns ({', '.join(columns[:10])}{', ...' if len(columns) > 10 else ''})"
+        )
+
+    def score_with_model(self):
+        columns = self.pca_interface.model_columns
+        if columns is None:
+            self.results_label.setText("Run PCA or load a model before scoring")
+            return
+        if self.source is None:
+            self.results_label.setText("No data loaded")
+            return
+        missing = [column for column in columns if column not in self.source.columns]
+        if missing:
+            self.results_label.setText(f"The loaded data is missing model columns: {', '.join(missing[:10])}")
+            return
+        file_name, _ = QFileDialog.getSaveFileName(self, "Save Scores", "", "CSV Files (*.csv)")
+        if not file_name:
+            return
+
+        source = self.source
+
+        def score(token, progress):
+            self.instrumentation.reset()
+            progress(f"Reading {len(columns)} columns...")
+            with self.instrumentation.span('read_columns'):
+                df = source.load_columns(columns, progress)
+            token.check()
+            progress("Scoring...")
+            scores = self.pca_interface.transform(df)
+            token.check()
+            progress(f"Writing {len(scores):,} rows...")
+            with self.instrumentation.span('write_scores'):
+                scores.to_csv(file_name, index=False)
+            return len(scores), file_name
+
+        self.task_runner.submit("Scoring with model...", score, self.show_scores, self.show_task_error)
+
+    def show_scores(self, result):
+        n_rows, file_name = result
+        text = f"Scored {n_rows:,} rows with {self.pca_interface.pca_calculator.get_n_components()} components, saved to {file_name}"
+        breakdown = self.instrumentation.format_breakdown()
+        if breakdown:
+            text += f"\n\nStages:\n{breakdown}"
+        self.results_label.setText(text)
+
+    def score_reconstruction(self):
+        columns = self.pca_interface.model_columns
+        if columns is None:
+            self.results_label.setText("Run PCA or load a model before scoring")
+            return
+        if self.pca_interface.pca_calculator.kernel_map is not None:
+            self.results_label.setText("Kernel PCA has no reconstruction")
+            return
+        if self.source is None:
+            self.results_label.setText("No data loaded")
+            return
+        missing = [column for column in columns if column not in self.source.columns]
+        if missing:
+            self.results_label.setText(f"The loaded data is missing model columns: {', '.join(missing[:10])}")
+            return
+        file_name, _ = QFileDialog.getSaveFileName(self, "Save Reconstruction Errors", "", "CSV Files (*.csv)")
+        if not file_name:
+            return
+
+        source = self.source
+
+        def score(token, progress):
+            self.instrumentation.reset()
+            progress(f"Reading {len(columns)} columns...")
+            with self.instrumentation.span('read_columns'):
+                df = source.load_columns(columns, progress)
+            token.check()
+
+            def report(message):
+                # Called between row chunks, so Cancel stops the scan there
+                token.check()
+                progress(message)
+
+            result = self.pca_interface.score_reconstruction(df, progress=report)
+            with self.instrumentation.span('write_errors'):
+                result['errors'].to_csv(file_name, index_label='row')
+            return result, file_name
+
+        self.task_runner.submit("Scoring reconstruction error...", score, self.show_reconstruction_errors,
+                                self.show_task_error)
+
+    def show_reconstruction_errors(self, result):
+        result, file_name = result
+        errors = result['errors']
+        text = (f"Reconstruction error of {len(errors):,} rows with {result['n_components']} components, saved to {file_name}\n"
+                f"Mean {errors.mean():.4g}, median {errors.median():.4g}\n\nWorst rows:\n")
+        text += "\n".join(f"{row}: {error:.4g}" for row, error in result['top_rows']['reconstruction_error'].head(10).items())
+        breakdown = self.instrumentation.format_breakdown()
+        if breakdown:
+            text += f"\n\nStages:\n{breakdown}"
+        self.results_label.setText(text)
+
+    def append_data(self):
+        columns = self.pca_interface.model_columns
+        if columns is None or self.pca_interface.pca_results is None:
+            self.results_label.setText("Run PCA before appending data")
+            return
+        file_name, _ = QFileDialog.getOpenFileName(self, "Select Data To Append", "", FILE_FILTER)
+        if not file_name:
+            return
+
+        label_column = self.pca_interface.label_column
+        forgetting = self.forgetting_spinbox.value()
+
+        def append(token, progress):
+            self.instrumentation.reset()
+            progress(f"Reading {file_name}...")
+            with self.instrumentation.span('read_columns'):
+                df = open_source(file_name).load_columns(columns + ([label_column] if label_column else []), progress)
+            token.check()
+            progress(f"Appending {len(df):,} rows...")
+            return self.pca_interface.append_data(df, forgetting)
+
+        self.task_runner.submit("Appending data...", append, self.show_append_results, self.show_task_error)
+
+    def show_append_results(self, results):
+        if not self.show_pca_results(results):
+            return
+        self.results_label.setText(
+            f"Appended {results['rows_added']:,} rows ({results['rows_seen']:,.0f} rows seen, weighted)\n"
+            f"{self.results_label.text()}"
+        )
+
+    def export_results(self):
+        if self.pca_interface.pca_results is None:
+            self.results_label.setText("Run PCA before exporting results")
+            return
+        from .pca_export import EXPORT_FILTER, EXTENSIONS, format_from_path
+        file_name, selected_filter = QFileDialog.getSaveFileName(self, "Export Results", "results_scores.parquet", EXPORT_FILTER)
+        if not file_name:
+            return
+        try:
+            fmt = format_from_path(file_name)
+        except ValueError:
+            # No recognised extension: use the format picked in the dialog
+            fmt = {'Parquet': 'parquet', 'Feather': 'feather', 'NumPy': 'npy'}[selected_filter.split(' ')[0]]
+            file_name += EXTENSIONS[fmt]
+        # The chosen name is the scores file; loadings and variance go next to it
+        prefix = file_name[:-len(EXTENSIONS[fmt])] if file_name.lower().endswith(EXTENSIONS[fmt]) else file_name.rsplit('.', 1)[0]
+        prefix = prefix[:-len('_scores')] if prefix.endswith('_scores') else prefix
+
+        def export(token, progress):
+            self.instrumentation.reset()
+            progress(f"Writing {len(self.pca_interface.pca_results):,} rows as {fmt}...")
+            return self.pca_interface.export_results(prefix, fmt)
+
+        self.task_runner.submit("Exporting results...", export, self.show_export, self.show_task_error)
+
+    def show_export(self, written):
+        files = [file_name for paths in written.values() for file_name in paths]
+        text = f"Exported {len(self.pca_interface.pca_results):,} rows to:\n" + "\n".join(files)
+        breakdown = self.instrumentation.format_breakdown()
+        if breakdown:
+            text += f"\n\nStages:\n{breakdown}"
+        self.results_label.setText(text)
+
+    def show_visualization(self, result):
+        results, figure, variance_text = result
+        plot_window = None
         if figure:
+            # Rendered here, on the GUI thread, so the draw shows up in the stage breakdown
             plot_window = PCAPlotWindow(figure, self)
+            with self.instrumentation.span('draw'):
+                plot_window.canvas.draw()
+
+        if not self.show_pca_results(results):
+            return
+
+        if plot_window is not None:
             plot_window.show()
             
             current_text = self.results_label.text()
             self.results_label.setText(f"{current_text}\n\n{variance_text}")
         else:
             self.results_label.setText(f"Unable to create visualization.\n\n{variance_text}")
-            
\ No newline at end of file
@@ -0,0 +1,145 @@
+import json
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager, ExitStack
+from threading import get_ident
+from time import perf_counter, time
+
+# Path of a JSON-lines file the GUI appends one record per finished span to
+LOG_FILE_ENV = 'PCA_INSTRUMENT_LOG'
+
+class Span:
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.attributes = attributes or {}
+        self.children = []
+        self.started_at = None
+        self.seconds = None
+        self.peak_bytes = None
+        self.error = None
+        self._base_memory = None
+        self._peak_seen = 0
+        self._owns_tracing = False
+
+    def path(self):
+        return self.name if self.parent is None else f"{self.parent.path()}/{self.name}"
+
+    def as_dict(self):
+        record = {
+            'span': self.path(),
+            'depth': self.depth,
+            'started_at': self.started_at,
+            'seconds': self.seconds,
+            'peak_bytes': self.peak_bytes,
+        }
+        if self.error is not None:
+            record['error'] = self.error
+        record.update(self.attributes)
+        return record
+
+class Instrumentation:
+    # Timed, nested spans with the peak traced memory of each stage
+    def __init__(self, enabled=True, track_memory=False, log_file=None, max_spans=1000):
+        self.enabled = enabled
+        self.track_memory = track_memory
+        self.log_file = log_file
+        self.spans = deque(maxlen=max_spans)
+        self._stack = []
+        self._hooks = []
+        self._thread = None
+
+    def add_hook(self, hook):
+        # hook(span) returns a context manager entered around the stage, e.g. to run a profiler
+        self._hooks.append(hook)
+        return hook
+
+    def remove_hook(self, hook):
+        self._hooks.remove(hook)
+
+    def reset(self):
+        self.spans.clear()
+
+    def _start_memory(self, span):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            span._owns_tracing = True
+        current, peak = tracemalloc.get_traced_memory()
+        # The peak is reset for this span, so every open span keeps what it has seen so far
+        for open_span in self._stack:
+            open_span._peak_seen = max(open_span._peak_seen, peak)
+        tracemalloc.reset_peak()
+        span._base_memory = current
+
+    def _stop_memory(self, span):
+        if span._base_memory is None or not tracemalloc.is_tracing():
+            return
+        peak = max(span._peak_seen, tracemalloc.get_traced_memory()[1])
+        span.peak_bytes = peak - span._base_memory
+        if span._owns_tracing:
+            tracemalloc.stop()
+
+    @contextmanager
+    def span(self, name, memory=None, **attributes):
+        # Spans nest within one thread; a span opened from another thread starts a new tree
+        if not self.enabled:
+            yield None
+            return
+        if self._thread != get_ident():
+            self._stack = []
+            self._thread = get_ident()
+
+        parent = self._stack[-1] if self._stack else None
+        span = Span(name, parent, attributes)
+        if memory is None:
+            memory = self.track_memory or (parent is not None and parent._base_memory is not None)
+        if memory:
+            self._start_memory(span)
+
+        self._stack.append(span)
+        try:
+            with ExitStack() as hooks:
+                for hook in self._hooks:
+                    hooks.enter_context(hook(span))
+                span.started_at = time()
+                start = perf_counter()
+                try:
+                    yield span
+                except BaseException as e:
+                    span.error = type(e).__name__
+                    raise
+                finally:
+                    span.seconds = perf_counter() - start
+                    self._stop_memory(span)
+        finally:
+            self._stack.pop()
+            if parent is not None:
+                parent.children.append(span)
+            else:
+                self.spans.append(span)
+            self._log(span)
+
+    def _log(self, span):
+        if self.log_file is None:
+            return
+        with open(self.log_file, 'a') as f:
+            f.write(json.dumps(span.as_dict(), default=str) + '\n')
+
+    def format_breakdown(self, max_depth=1):
+        lines = []
+
+        def walk(span):
+            text = f"{'  ' * span.depth}{span.name}: {span.seconds:.3f}s"
+            if span.peak_bytes is not None:
+                text += f", peak {span.peak_bytes / 1024 ** 2:.1f} MB"
+            lines.append(text)
+            if span.depth < max_depth:
+                for child in span.children:
+                    walk(child)
+
+        for span in self.spans:
+            walk(span)
+        return '\n'.join(lines)
+
+NO_INSTRUMENTATION = Instrumentation(enabled=False)
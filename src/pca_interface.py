@@ -1,65 +1,663 @@
-from pandas import DataFrame
-from .pca_calc import PCACalculator
+from collections import OrderedDict
+from copy import copy
+from hashlib import blake2b
+from os import stat
+from os.path import abspath
+from numpy import (vstack, concatenate, isfinite, empty, float32, float64, arange, argpartition, argsort, intp, asarray, zeros, outer, column_stack,
+                   append, bincount, cumsum, linspace, ascontiguousarray, dtype as numpy_dtype)
+from pandas import DataFrame, Series, Categorical, read_csv, SparseDtype
+from pandas.util import hash_pandas_object
+from pandas.api.types import is_numeric_dtype, is_bool_dtype, is_extension_array_dtype
+from .pca_calc import PCACalculator, StreamingMoments, TRANSFORM_CHUNK_ROWS, N_LANDMARKS
+from .pca_instrument import Instrumentation
+from .pca_rank import select_rank, N_PERMUTATIONS, N_FOLDS
 
 class PCAInterface:
-    def __init__(self):
-        self.pca_calculator = PCACalculator()
+    def __init__(self, cache_max_bytes=256 * 1024 ** 2, min_fit_components=3, max_moment_columns=2000,
+                 low_memory=False, track_memory=False, instrumentation=None):
+        # Timed spans for every stage; see pca_instrument for hooks and the JSON-lines log
+        self.instrumentation = instrumentation if instrumentation is not None else Instrumentation()
+        self.pca_calculator = PCACalculator(self.instrumentation)
         self.df = None
+        self.file_name = None
+        self.chunksize = None
         self.selected_columns = None
         self.label_column = None
         self.pca_results = None
+        self.labels = None
+        self._pca_dataframe = None
+        # Codes, classes and colors of categorical labels, rebuilt whenever self.labels is replaced
+        self._label_index = None
+        # Column names, in order, of the current model (last fit or loaded)
+        self.model_columns = None
+        # Growable score and label buffers behind append_data
+        self._append_buffers = {}
+        # Batches appended since the last fit, with their model columns, for append_data(reproject=True)
+        self._appended = []
+
+        # float32 end to end, standardized in place on one contiguous buffer
+        self.low_memory = low_memory
+        self.track_memory = track_memory
+        self.peak_memory = None
+        self.input_bytes = None
+
+        # Fitted results keyed by (dataset fingerprint, columns, label, solver), least recently used first
+        self.cache_max_bytes = cache_max_bytes
+        self.min_fit_components = min_fit_components
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        # Content hash of each column of the loaded frame, computed on first use after each load_data
+        self._column_hashes = {}
+
+        # Column means, scales and correlation of every numeric column of the loaded frame
+        self.max_moment_columns = max_moment_columns
+        self._moments = None
+        self._moment_columns = None
+        # Content hash of each column the moments were computed from
+        self._moment_hashes = {}
 
     def load_data(self, df, selected_columns, label_column=None):
+        # Hashes are dropped even for the same frame, so edits made in place since the last call are
+        # seen; edits made after it, without calling load_data again, are not
+        self._column_hashes = {}
         self.df = df
+        self.file_name = None
         self.selected_columns = selected_columns
         self.label_column = label_column
 
-    def run_pca(self, n_components=2):
-        if self.df is None or not self.selected_columns:
+    def load_file(self, file_name, selected_columns, label_column=None, chunksize=100_000):
+        # Streaming mode: the file is only ever read chunk by chunk when PCA runs
+        self._column_hashes = {}
+        self.df = None
+        self.file_name = file_name
+        self.chunksize = chunksize
+        self.selected_columns = selected_columns
+        self.label_column = label_column
+
+    def _read_chunks(self, columns):
+        for chunk in read_csv(self.file_name, usecols=columns, chunksize=self.chunksize):
+            yield chunk
+
+    def _column_hash(self, column):
+        # Every value of the column goes into the hash, so editing any single row changes it (once
+        # load_data has been called again)
+        digest = self._column_hashes.get(column)
+        if digest is None:
+            values = self.df[column]
+            hasher = blake2b(digest_size=16)
+            if isinstance(values.dtype, SparseDtype):
+                hasher.update(str(values.dtype.fill_value).encode())
+                hasher.update(ascontiguousarray(values.array.sp_index.indices))
+                hasher.update(ascontiguousarray(values.array.sp_values))
+            elif isinstance(values.dtype, numpy_dtype) and values.dtype.kind in 'biufcmM':
+                # Numpy-typed columns are hashed from their raw bytes
+                hasher.update(ascontiguousarray(values.to_numpy()).view('u1'))
+            else:
+                hasher.update(hash_pandas_object(values, index=False).to_numpy())
+            digest = hasher.hexdigest()
+            self._column_hashes[column] = digest
+        return digest
+
+    def get_fingerprint(self, columns=None):
+        # Streamed files by path, size and mtime, read again on every call so a rewritten file is
+        # fitted again; in-memory frames by the row count plus the name, dtype and content hash of
+        # each of the given columns (all of them by default)
+        if self.file_name is not None:
+            file_stat = stat(self.file_name)
+            return ('file', abspath(self.file_name), file_stat.st_size, file_stat.st_mtime_ns)
+
+        dtypes = self.df.dtypes
+        columns = self.df.columns if columns is None else columns
+        return ('frame', len(self.df), tuple((str(c), str(dtypes[c]), self._column_hash(c)) for c in columns))
+
+    def get_column_moments(self, chunksize=100_000):
+        if self.df is None:
+            raise ValueError("Column moments are only available for in-memory data")
+
+        # Read the dtypes only; select_dtypes would copy the numeric block
+        # Sparse columns are left out: their moments come from the nonzeros at fit time
+        numeric = [c for c, dtype in self.df.dtypes.items()
+                   if is_numeric_dtype(dtype) and not is_bool_dtype(dtype) and not isinstance(dtype, SparseDtype)]
+        if self._moments is not None and (self._moments.count != len(self.df) or any(
+                column in self.df.columns and self._column_hash(column) != digest
+                for column, digest in self._moment_hashes.items())):
+            # The columns the moments cover no longer hold the same values
+            self._moments = None
+        if not 0 < len(numeric) <= self.max_moment_columns:
+            self._moments = None
+            self._moment_columns = None
+            self._moment_hashes = {}
+            return None
+
+        new = numeric if self._moments is None else [c for c in numeric if c not in self._moment_columns]
+        if self._moments is not None and len(self._moment_columns) + len(new) > self.max_moment_columns:
+            new = numeric
+            self._moments = None
+        if new:
+            if self._moments is None:
+                # Row chunks, so only one chunk of the numeric block is ever copied
+                moments = StreamingMoments(len(new))
+                for start in range(0, len(self.df), chunksize):
+                    moments.update(self.df.iloc[start:start + chunksize][new].values)
+                self._moments = moments
+                self._moment_columns = {}
+                self._moment_hashes = {}
+            else:
+                self._extend_moments(new, chunksize)
+            for column in new:
+                self._moment_columns[column] = len(self._moment_columns)
+                self._moment_hashes[column] = self._column_hash(column)
+        return self._moments
+
+    def _extend_moments(self, columns, chunksize):
+        # Columns loaded after the moments were built: only their means, their co-moments and their
+        # cross co-moments with the cached columns are computed, the cached block is kept as is
+        # Every column is read through its own array (a view for numpy-typed columns): row slices
+        # of a frame with inserted columns would consolidate, i.e. copy, all of its columns each time
+        cached = [self.df[column].to_numpy() for column in self._moment_columns]
+        added = [self.df[column].to_numpy() for column in columns]
+        n_rows = len(self.df)
+        mean = asarray([asarray(values, dtype=float64).mean() for values in added])
+
+        cross = zeros((len(cached), len(columns)))
+        comoment = zeros((len(columns), len(columns)))
+        residual = zeros(len(columns))
+        for start in range(0, n_rows, chunksize):
+            centered = column_stack([asarray(values[start:start + chunksize], dtype=float64) for values in added]) - mean
+            # The cached columns are used uncentered; their means come back in through the residual
+            # sum of the centered new columns, which is zero up to rounding
+            for i, values in enumerate(cached):
+                cross[i] += asarray(values[start:start + chunksize], dtype=float64) @ centered
+            comoment += centered.T @ centered
+            residual += centered.sum(axis=0)
+        cross -= outer(self._moments.mean, residual)
+        self._moments.add_columns(mean, cross, comoment)
+
+    def _get_selected_moments(self):
+        # Submatrix for the selected columns, or None when a full fit is needed
+        moments = self.get_column_moments()
+        if moments is None or moments.count < 2 or not all(c in self._moment_columns for c in self.selected_columns):
+            return None
+        subset = moments.subset([self._moment_columns[c] for c in self.selected_columns])
+        if not isfinite(subset.comoment).all():
+            return None
+        return subset
+
+    def clear_cache(self):
+        self._cache.clear()
+        self._cache_bytes = 0
+
+    def _cache_lookup(self, key, n_components):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        calculator, _, _, _ = entry
+        wanted = len(self.selected_columns) if n_components is None else n_components
+        if calculator.get_n_components() < wanted:
+            return None
+        self._cache.move_to_end(key)
+        return entry
+
+    def _cache_store(self, key, calculator, scores, labels):
+        size = scores.nbytes + calculator.get_components().nbytes + (labels.nbytes if labels is not None else 0)
+        if size > self.cache_max_bytes:
+            return
+        if key in self._cache:
+            self._cache_bytes -= self._cache.pop(key)[3]
+        self._cache[key] = (calculator, scores, labels, size)
+        self._cache_bytes += size
+        while self._cache_bytes > self.cache_max_bytes:
+            self._cache_bytes -= self._cache.popitem(last=False)[1][3]
+
+    def get_dtype(self):
+        return float32 if self.low_memory else float64
+
+    def _selected_array(self):
+        if not self.low_memory:
+            return self.df[self.selected_columns].values
+        # Fill a single C-contiguous float32 buffer column by column, without a float64 intermediate
+        X = empty((len(self.df), len(self.selected_columns)), dtype=float32)
+        for j, column in enumerate(self.selected_columns):
+            X[:, j] = self.df[column].to_numpy()
+        return X
+
+    def is_sparse_selection(self, df=None, columns=None):
+        df = self.df if df is None else df
+        columns = self.selected_columns if columns is None else columns
+        dtypes = df.dtypes
+        return any(isinstance(dtypes[column], SparseDtype) for column in columns)
+
+    def _sparse_block(self, df, columns):
+        # CSR matrix of the columns, built from the nonzeros of the sparse ones; never densified
+        from scipy.sparse import csr_matrix, hstack
+        dtypes = df.dtypes
+        sparse_columns = [c for c in columns if isinstance(dtypes[c], SparseDtype)]
+        dense_columns = [c for c in columns if not isinstance(dtypes[c], SparseDtype)]
+        invalid = [c for c in sparse_columns if dtypes[c].fill_value != 0]
+        if invalid:
+            raise ValueError(f"Sparse columns need a fill value of 0: {', '.join(map(str, invalid[:10]))}")
+
+        blocks = []
+        if sparse_columns:
+            blocks.append(df[sparse_columns].sparse.to_coo())
+        if dense_columns:
+            blocks.append(csr_matrix(df[dense_columns].to_numpy(dtype=self.get_dtype())))
+        X = hstack(blocks, format='csr', dtype=self.get_dtype())
+        if sparse_columns and dense_columns:
+            positions = {c: i for i, c in enumerate(sparse_columns + dense_columns)}
+            X = X[:, [positions[c] for c in columns]]
+        return X
+
+    def _project(self, calculator, df=None, columns=None, chunksize=TRANSFORM_CHUNK_ROWS):
+        # Row chunks of the model columns, so projecting never copies the whole block
+        df = self.df if df is None else df
+        columns = self.selected_columns if columns is None else columns
+        if self.is_sparse_selection(df, columns):
+            return calculator.transform(self._sparse_block(df, columns), chunksize)
+        scores = empty((len(df), calculator.get_n_components()), dtype=self.get_dtype())
+        for start in range(0, len(df), chunksize):
+            chunk = df.iloc[start:start + chunksize][columns].to_numpy(dtype=self.get_dtype())
+            scores[start:start + chunksize] = calculator.transform(chunk, chunksize)
+        return scores
+
+    def run_pca(self, n_components=2, solver='auto', kernel=None, n_landmarks=N_LANDMARKS, gamma=None):
+        # kernel='rbf', 'poly', ... switches to approximate kernel PCA on n_landmarks Nystrom landmarks
+        if (self.df is None and self.file_name is None) or not self.selected_columns:
             raise ValueError("Data and selected columns must be set before running PCA")
+        if kernel is not None and (self.df is None or self.is_sparse_selection()):
+            raise ValueError("Kernel PCA needs dense, in-memory columns")
+
+        kernel_options = (kernel, n_landmarks, gamma) if kernel is not None else None
+        with self.instrumentation.span('run_pca', solver=solver, kernel=kernel, n_columns=len(self.selected_columns)) as span:
+            results = self._run_pca(n_components, solver, kernel_options)
+            if span is not None:
+                span.attributes['cached'] = results['cached']
+        return results
+
+    def _run_pca(self, n_components, solver, kernel_options=None):
+        with self.instrumentation.span('fingerprint'):
+            # Only the columns this fit reads are hashed
+            columns = list(self.selected_columns) + ([self.label_column] if self.label_column else [])
+            key = (self.get_fingerprint(columns), tuple(self.selected_columns), self.label_column, solver, self.low_memory,
+                   kernel_options)
+        entry = self._cache_lookup(key, n_components)
+        cached = entry is not None
+
+        if not cached:
+            # Fit once at the largest rank the views ask for, lower ranks are served by slicing
+            sparse = self.df is not None and self.is_sparse_selection()
+            fit_components = n_components
+            if n_components is not None:
+                max_components = len(self.selected_columns)
+                if self.df is not None:
+                    max_components = min(max_components, len(self.df))
+                if sparse:
+                    # ARPACK needs k < min(n, p)
+                    max_components -= 1
+                if kernel_options is not None:
+                    # Components live in the landmark feature space, not the column space
+                    max_components = min(len(self.df), kernel_options[1])
+                fit_components = max(n_components, min(self.min_fit_components, max_components))
+
+            calculator = PCACalculator(self.instrumentation)
+            with self.instrumentation.span('fit', memory=True if self.track_memory else None) as span:
+                if self.file_name is not None:
+                    scores, labels = self._fit_stream(calculator, fit_components)
+                else:
+                    self.input_bytes = len(self.df) * len(self.selected_columns) * self.get_dtype()().itemsize
+                    with self.instrumentation.span('column_moments'):
+                        # Low-memory fits of tall data take the moments path whatever the solver: it reads
+                        # the rows a chunk at a time, while the SVD solvers need 2-4x the input on top of it
+                        tall = calculator.select_solver(len(self.df), len(self.selected_columns)) == 'covariance_eigh'
+                        linear = (solver == 'auto' or self.low_memory and tall) and not sparse and kernel_options is None
+                        moments = self._get_selected_moments() if linear else None
+                    if kernel_options is not None:
+                        kernel, n_landmarks, gamma = kernel_options
+                        with self.instrumentation.span('gather_columns'):
+                            X = self._selected_array()
+                        scores = calculator.fit_kernel(X, fit_components, kernel, n_landmarks, gamma)
+                        del X
+                    elif sparse:
+                        # Implicitly centered truncated SVD; the solver choice does not apply
+                        with self.instrumentation.span('gather_columns', sparse=True):
+                            X = self._sparse_block(self.df, self.selected_columns)
+                        self.input_bytes = X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+                        scores = calculator.fit_sparse(X, fit_components)
+                        del X
+                    elif moments is not None:
+                        # Only the final projection touches the rows
+                        calculator.fit_moments(moments, fit_components)
+                        with self.instrumentation.span('project'):
+                            scores = self._project(calculator)
+                    else:
+                        with self.instrumentation.span('gather_columns'):
+                            X = self._selected_array()
+                        scores = calculator.fit_transform(X, fit_components, solver, copy=not self.low_memory)
+                        del X
+                    labels = self.df[self.label_column].values if self.label_column else None
+            self.peak_memory = span.peak_bytes if span is not None else None
+            self._cache_store(key, calculator, scores, labels)
+            entry = (calculator, scores, labels, None)
+
+        calculator, scores, labels, _ = entry
+        self.pca_calculator = calculator.truncate(n_components)
+        self.model_columns = list(self.selected_columns)
+        self.pca_results = scores[:, :self.pca_calculator.get_n_components()]
+        self.labels = labels
+        self._appended = []
+        self._pca_dataframe = None
+
+        results = self._build_results()
+        results['cached'] = cached
+        if self.track_memory and not cached:
+            results['peak_memory'] = self.peak_memory
+            results['input_bytes'] = self.input_bytes
+        return results
 
-        X = self.df[self.selected_columns].values
-        self.pca_results = self.pca_calculator.fit_transform(X, n_components)
+    def run_pca_stream(self, n_components=2):
+        if self.file_name is None or not self.selected_columns:
+            raise ValueError("File and selected columns must be set before running PCA")
+        return self.run_pca(n_components)
 
+    def _fit_stream(self, calculator, n_components):
+        # First pass: accumulate scaling statistics and the correlation matrix
+        self.input_bytes = None
+        calculator.fit_stream(
+            (chunk[self.selected_columns].values for chunk in self._read_chunks(self.selected_columns)),
+            n_components
+        )
+
+        # Second pass: project the rows chunk by chunk, keeping only the scores and labels
+        columns = list(self.selected_columns)
+        if self.label_column and self.label_column not in columns:
+            columns.append(self.label_column)
+        scores, labels = [], []
+        with self.instrumentation.span('project'):
+            for chunk in self._read_chunks(columns):
+                scores.append(calculator.transform(chunk[self.selected_columns].to_numpy(dtype=self.get_dtype())))
+                if self.label_column:
+                    labels.append(chunk[self.label_column].values)
+
+        return vstack(scores), concatenate(labels) if self.label_column else None
+
+    def _build_results(self):
         results = {
             'pca_components': self.pca_results,
             'explained_variance_ratio': self.pca_calculator.get_explained_variance_ratio(),
-            'n_components': self.pca_calculator.get_n_components()
+            'n_components': self.pca_calculator.get_n_components(),
+            'solver': self.pca_calculator.get_solver(),
+            'fit_time': self.pca_calculator.get_fit_time()
         }
 
         if self.label_column:
-            results['labels'] = self.df[self.label_column].values
+            results['labels'] = self.labels
+
+        return results
+
+    def select_rank(self, max_components=None, n_permutations=N_PERMUTATIONS, n_folds=N_FOLDS, n_jobs=None, progress=None):
+        # Recommended number of components for the selected columns; see pca_rank
+        if self.df is None or not self.selected_columns:
+            raise ValueError("In-memory data and selected columns must be set before selecting a rank")
+        if self.is_sparse_selection():
+            raise ValueError("Rank selection works on dense columns; the selection contains sparse columns")
+        with self.instrumentation.span('select_rank', n_permutations=n_permutations, n_folds=n_folds):
+            return select_rank(self.df[self.selected_columns].to_numpy(dtype=float64), max_components,
+                               n_permutations, n_folds, n_jobs=n_jobs, progress=progress)
+
+    def save_model(self, file_name):
+        if self.model_columns is None:
+            raise ValueError("PCA has not been run yet")
+        self.pca_calculator.save(file_name, self.model_columns)
+
+    def load_model(self, file_name):
+        calculator = PCACalculator(self.instrumentation)
+        self.model_columns = calculator.load(file_name)
+        self.pca_calculator = calculator
+        self.pca_results = None
+        self.labels = None
+        self._appended = []
+        self._pca_dataframe = None
+        return self.model_columns
+
+    def _model_data(self, df):
+        # The frame to score and its columns matching the model's, in model order
+        if self.model_columns is None:
+            raise ValueError("No fitted or loaded model")
+        df = self.df if df is None else df
+        if df is None:
+            raise ValueError("No data to transform")
+
+        # Saved models keep column names as strings
+        by_name = {str(column): column for column in df.columns}
+        missing = [column for column in self.model_columns if str(column) not in by_name]
+        if missing:
+            raise ValueError(f"Columns missing from the data: {', '.join(map(str, missing))}")
+        return df, [by_name[str(column)] for column in self.model_columns]
+
+    def transform(self, df=None, chunksize=TRANSFORM_CHUNK_ROWS):
+        # Scores new rows with the current model: one standardize-and-multiply per chunk, no fit
+        df, columns = self._model_data(df)
+        with self.instrumentation.span('transform', rows=len(df)):
+            scores = self._project(self.pca_calculator, df, columns, chunksize)
+        return DataFrame(scores, columns=[f"PC{i+1}" for i in range(scores.shape[1])], index=df.index, copy=False)
+
+    def append_data(self, df, forgetting=1.0, reproject=False, chunksize=TRANSFORM_CHUNK_ROWS):
+        # Folds a new batch of rows into the current model instead of refitting over the whole history,
+        # then scores only the new rows and appends them; reproject=True rescores the in-memory history
+        # too, i.e. the rows of the fit and every batch appended since (those batches are kept for it)
+        df, columns = self._model_data(df)
+        if self.is_sparse_selection(df, columns):
+            raise ValueError("Updates need dense columns; the batch contains sparse columns")
+        if self.pca_calculator.kernel_map is not None:
+            raise ValueError("Kernel PCA models cannot be updated")
+        if self.label_column and self.pca_results is not None and self.label_column not in df.columns:
+            raise ValueError(f"The batch is missing the label column {self.label_column}")
+
+        # A copy, so the cached result for the original data is left as it was
+        calculator = copy(self.pca_calculator)
+        with self.instrumentation.span('append', rows=len(df), forgetting=forgetting):
+            if calculator.moments is None:
+                # Fits that bypassed the moments get them once, from the in-memory rows they were fitted on
+                if self.df is None or self.pca_results is None or list(self.selected_columns) != list(columns):
+                    raise ValueError("The model keeps no running moments and its training rows are not loaded; run PCA first")
+                with self.instrumentation.span('column_moments'):
+                    moments = self._get_selected_moments()
+                    if moments is None:
+                        moments = StreamingMoments(len(columns))
+                        for start in range(0, len(self.df), chunksize):
+                            moments.update(self.df.iloc[start:start + chunksize][columns].to_numpy(dtype=float64))
+                calculator.moments = moments
 
+            calculator.partial_fit(df[columns].to_numpy(dtype=float64), forgetting, chunksize)
+            with self.instrumentation.span('project', rows=len(df)):
+                scores = self._project(calculator, df, columns, chunksize)
+                previous = self.pca_results
+                if reproject and previous is not None and self.df is not None:
+                    # The whole history: the rows of the fit followed by every batch appended since
+                    history = [self._model_data(None)] + self._appended
+                    if sum(len(frame) for frame, _ in history) != len(previous):
+                        raise ValueError("The loaded data no longer matches the scores; run PCA again to reproject")
+                    previous = vstack([self._project(calculator, frame, frame_columns, chunksize)
+                                       for frame, frame_columns in history])
+
+        self.pca_calculator = calculator
+        self.pca_results = scores if previous is None else self._append_rows('scores', previous, scores)
+        self._appended.append((df, columns))
+        if self.label_column and self.labels is not None:
+            self.labels = self._append_rows('labels', self.labels, df[self.label_column].values)
+        self._pca_dataframe = None
+
+        results = self._build_results()
+        results['cached'] = False
+        results['rows_added'] = len(df)
+        results['rows_seen'] = calculator.moments.count
         return results
 
+    def _append_rows(self, name, previous, new):
+        # Rows go into a buffer that doubles when full, so each append copies the batch, not the history
+        if isinstance(previous, Categorical):
+            # Categorical labels grow their codes; categories new to this batch are added at the end
+            new = new if isinstance(new, Categorical) else Categorical(new)
+            added = new.categories[~new.categories.isin(previous.categories)]
+            if len(added):
+                previous = previous.set_categories(previous.categories.append(added), ordered=False)
+            new = new.set_categories(previous.categories, ordered=previous.ordered)
+            codes = self._append_rows(name, previous.codes, new.codes)
+            return Categorical.from_codes(codes, dtype=previous.dtype)
+        # Other extension arrays (nullable, string, ...) are buffered as objects
+        if is_extension_array_dtype(previous.dtype):
+            previous = asarray(previous, dtype=object)
+        if is_extension_array_dtype(new.dtype):
+            new = asarray(new, dtype=object)
+        n_rows = len(previous) + len(new)
+        dtype = previous.dtype if new.dtype == previous.dtype else object
+        buffer = self._append_buffers.get(name)
+        if buffer is None or previous.base is not buffer or len(buffer) < n_rows or buffer.dtype != dtype:
+            buffer = empty((2 * n_rows,) + previous.shape[1:], dtype=dtype)
+            buffer[:len(previous)] = previous
+            self._append_buffers[name] = buffer
+        buffer[len(previous):n_rows] = new
+        return buffer[:n_rows]
+
+    def score_reconstruction(self, df=None, out_file=None, top_k=20, chunksize=TRANSFORM_CHUNK_ROWS, progress=None):
+        # Per-row reconstruction error of the current model, streamed a row chunk at a time; the
+        # reconstructed matrix is never held in memory. out_file (.npy) receives the reconstruction
+        # through a memmap, in model column order. The top_k worst rows are kept and reported as it goes
+        df, columns = self._model_data(df)
+        calculator = self.pca_calculator
+        n_rows = len(df)
+        X = self._sparse_block(df, columns) if self.is_sparse_selection(df, columns) else None
+
+        reconstructed = None
+        if out_file is not None:
+            from numpy.lib.format import open_memmap
+            reconstructed = open_memmap(out_file, mode='w+', dtype=self.get_dtype(), shape=(n_rows, len(columns)))
+
+        errors = empty(n_rows)
+        top_rows = empty(0, dtype=intp)
+        with self.instrumentation.span('reconstruction_error', rows=n_rows, to_file=out_file is not None):
+            for start in range(0, n_rows, chunksize):
+                stop = min(n_rows, start + chunksize)
+                chunk = X[start:stop] if X is not None else df.iloc[start:stop][columns].to_numpy(dtype=self.get_dtype())
+                errors[start:stop] = calculator.reconstruction_error(
+                    chunk, chunksize, None if reconstructed is None else reconstructed[start:stop]
+                )
+                if top_k > 0:
+                    # This chunk's worst rows merged with the worst so far
+                    chunk_top = arange(start, stop)
+                    if len(chunk_top) > top_k:
+                        chunk_top = start + argpartition(errors[start:stop], -top_k)[-top_k:]
+                    candidates = concatenate([top_rows, chunk_top])
+                    top_rows = candidates[argsort(errors[candidates])[::-1][:top_k]]
+                if progress is not None:
+                    worst = ", ".join(f"{df.index[row]} ({errors[row]:.4g})" for row in top_rows[:3])
+                    progress(f"Reconstruction error: {stop:,}/{n_rows:,} rows" + (f", worst so far: {worst}" if worst else ""))
+            if reconstructed is not None:
+                reconstructed.flush()
+                del reconstructed
+
+        return {
+            'errors': Series(errors, index=df.index, name='reconstruction_error'),
+            'top_rows': DataFrame({'reconstruction_error': errors[top_rows]}, index=df.index[top_rows]),
+            'n_components': calculator.get_n_components(),
+            'reconstruction_file': out_file,
+        }
+
+    def export_results(self, prefix, fmt='parquet', chunk_rows=None):
+        # Scores (with labels), loadings and explained variance of the last run as <prefix>_*.parquet,
+        # .feather or .npy, with the fit metadata; see pca_export
+        if self.pca_results is None:
+            raise ValueError("PCA has not been run yet")
+        # Imported here so the GUI does not load pyarrow's writers until the first export
+        from . import pca_export
+        with self.instrumentation.span('export', fmt=fmt, rows=len(self.pca_results)):
+            return pca_export.export_results(self.pca_calculator, self.pca_results, self.model_columns, prefix, fmt,
+                                             self.labels if self.label_column else None, self.label_column,
+                                             chunk_rows or pca_export.EXPORT_CHUNK_ROWS)
 
     def get_pca_dataframe(self):
         if self.pca_results is None:
             raise ValueError("PCA has not been run yet")
+        # Built once per fit; the frame wraps the score array without copying it
+        if self._pca_dataframe is not None:
+            return self._pca_dataframe
 
-        pca_df = DataFrame(
-            self.pca_results,
-            columns=[f"PC{i+1}" for i in range(self.pca_calculator.get_n_components())]
-        )
+        with self.instrumentation.span('pca_dataframe'):
+            pca_df = DataFrame(
+                self.pca_results,
+                columns=[f"PC{i+1}" for i in range(self.pca_calculator.get_n_components())],
+                copy=False
+            )
 
-        if self.label_column:
-            pca_df['label'] = self.df[self.label_column]
+            if self.label_column:
+                pca_df['label'] = self.labels
 
+        self._pca_dataframe = pca_df
         return pca_df
 
+    def get_label_index(self):
+        # Categorical labels as integer codes into sorted classes, with the rows per class; None
+        # without labels or for numeric ones. Built once per set of labels and shared by every plot
+        labels = self.labels
+        if labels is None or not self.label_column or is_numeric_dtype(labels.dtype):
+            return None
+        if self._label_index is not None and self._label_index['labels'] is labels:
+            return self._label_index
+
+        with self.instrumentation.span('label_index', rows=len(labels)):
+            categorical = labels if isinstance(labels, Categorical) else Categorical(labels)
+            codes = categorical.codes.astype(intp)
+            classes = asarray(categorical.categories, dtype=object)
+            if (codes < 0).any():
+                # Missing labels form a class of their own
+                codes[codes < 0] = len(classes)
+                classes = append(classes, 'missing')
+            counts = bincount(codes, minlength=len(classes))
+            used = counts > 0
+            if not used.all():
+                # Unused categories of a categorical column get no code, color or legend entry
+                codes = (cumsum(used) - 1)[codes]
+                classes = classes[used]
+                counts = counts[used]
+
+        self._label_index = {'labels': labels, 'codes': codes, 'classes': classes, 'counts': counts, 'colors': {}}
+        return self._label_index
+
+    def get_label_colors(self, cmap='viridis'):
+        # One RGBA row per class of get_label_index, spread evenly over the colormap
+        index = self.get_label_index()
+        if index is None:
+            return None
+        if cmap not in index['colors']:
+            # Plot-only; headless callers never get here
+            from matplotlib import colormaps
+            index['colors'][cmap] = colormaps[cmap](linspace(0, 1, len(index['classes'])))
+        return index['colors'][cmap]
+
     def get_loadings(self):
-        if self.pca_calculator.pca is None:
+        if self.pca_calculator.get_components() is None:
             raise ValueError("PCA has not been run yet")
+        if self.pca_calculator.kernel_map is not None:
+            raise ValueError("Kernel PCA components have no per-column loadings")
 
         return DataFrame(
-            self.pca_calculator.pca.components_.T,
+            self.pca_calculator.get_components().T,
             columns=[f"PC{i+1}" for i in range(self.pca_calculator.get_n_components())],
-            index=self.selected_columns
+            index=self.model_columns
         )
 
-    def reconstruct_original_data(self):
+    def reconstruct_original_data(self, out_file=None, chunksize=TRANSFORM_CHUNK_ROWS):
+        # With out_file (.npy) the reconstruction is written through a memmap and the memmap returned
         if self.pca_results is None:
             raise ValueError("PCA has not been run yet")
 
-        reconstructed = self.pca_calculator.inverse_transform(self.pca_results)
-        return DataFrame(reconstructed, columns=self.selected_columns)
\ No newline at end of file
+        if out_file is None:
+            reconstructed = self.pca_calculator.inverse_transform(self.pca_results, chunksize)
+            return DataFrame(reconstructed, columns=self.model_columns, copy=False)
+
+        from numpy.lib.format import open_memmap
+        reconstructed = open_memmap(out_file, mode='w+', dtype=self.pca_results.dtype,
+                                    shape=(len(self.pca_results), len(self.model_columns)))
+        self.pca_calculator.inverse_transform(self.pca_results, chunksize, reconstructed)
+        reconstructed.flush()
+        return reconstructed
@@ -0,0 +1,245 @@
+from abc import ABC, abstractmethod
+from csv import reader as csv_reader
+from os.path import splitext
+from numpy import load as np_load
+from pandas import DataFrame, read_csv, concat
+
+try:
+    import pyarrow
+    from pyarrow import csv as pa_csv, parquet as pa_parquet, ipc as pa_ipc
+except ImportError:
+    pyarrow = None
+
+PREVIEW_ROWS = 10_000
+# Columns added to an already loaded frame one at a time before it is rebuilt in one concat
+INSERT_COLUMNS = 64
+# Wide files get fewer preview rows, so the preview stays small whatever the width
+PREVIEW_CELLS = 1_000_000
+PREVIEW_COLUMN_GROUP = 1000
+# CSV columns are read as a stream of blocks of this size, with a cancellation point between them
+CSV_BLOCK_BYTES = 16 * 1024 ** 2
+CSV_CHUNK_ROWS = 100_000
+
+def _require_pyarrow(kind):
+    if pyarrow is None:
+        raise ImportError(f"Reading {kind} files requires pyarrow (pip install pyarrow)")
+
+class DataSource(ABC):
+    # Opening a source only reads the schema and a preview; full columns are read on demand
+    def __init__(self, file_name, preview_rows=PREVIEW_ROWS):
+        self.file_name = file_name
+        self.preview_rows = preview_rows
+        self.columns = []
+        self.preview = None
+        self.n_rows = None
+        self.frame = None
+        self._inserted = 0
+
+    def _preview_rows(self, n_columns):
+        return max(1, min(self.preview_rows, PREVIEW_CELLS // max(1, n_columns)))
+
+    def load_columns(self, columns, progress=None):
+        # Returns a frame holding every column loaded so far. A few new columns are added to it in
+        # place, so it stays the same object and PCAInterface keeps the hashes and moments of the
+        # columns already loaded; many single-column inserts fragment a frame, so past
+        # INSERT_COLUMNS it is rebuilt in one concat instead.
+        # progress(message) is called between the batches a file is read in (CSV blocks, Parquet row
+        # groups, Feather record batches); it may raise to stop the read there, as the GUI's cancel
+        # token does. Memory-mapped .npy and .npz files are read in one go
+        missing = [c for c in dict.fromkeys(columns) if self.frame is None or c not in self.frame.columns]
+        if missing:
+            new_columns = self._read_columns(missing, progress)
+            if self.frame is None:
+                self.frame = new_columns
+            elif self._inserted + len(missing) <= INSERT_COLUMNS:
+                for column in missing:
+                    self.frame[column] = new_columns[column]
+                self._inserted += len(missing)
+            else:
+                frame = concat([self.frame, new_columns], axis=1)
+                # Inserted columns are one block each; the copy merges them back
+                self.frame = frame.copy() if self._inserted else frame
+                self._inserted = 0
+            self.n_rows = len(self.frame)
+        return self.frame
+
+    @abstractmethod
+    def _read_columns(self, columns, progress=None):
+        # A frame of the given columns, in the given order, over every row
+        pass
+
+    def _report(self, progress, rows):
+        if progress is not None:
+            total = f" of {self.n_rows:,}" if self.n_rows is not None else ""
+            progress(f"Read {rows:,}{total} rows")
+
+class CSVSource(DataSource):
+    def __init__(self, file_name, preview_rows=PREVIEW_ROWS):
+        super().__init__(file_name, preview_rows)
+        # The header line first, for the width the preview is sized by; read_csv(nrows=0) is slow on
+        # wide files
+        with open(file_name, newline='') as header:
+            n_columns = len(next(csv_reader(header), []))
+        rows = self._preview_rows(n_columns)
+        self.preview = read_csv(file_name, nrows=rows)
+        self.columns = list(self.preview.columns)
+        if len(self.preview) < rows:
+            self.n_rows = len(self.preview)
+
+    def _read_columns(self, columns, progress=None):
+        if pyarrow is None:
+            chunks, rows = [], 0
+            for chunk in read_csv(self.file_name, usecols=columns, chunksize=CSV_CHUNK_ROWS):
+                chunks.append(chunk[columns])
+                rows += len(chunk)
+                self._report(progress, rows)
+            return concat(chunks, ignore_index=True) if chunks else read_csv(self.file_name, usecols=columns, nrows=0)[columns]
+
+        # Arrow's parser as a stream of blocks, only converting the requested columns
+        convert_options = pa_csv.ConvertOptions(include_columns=columns)
+        reader = pa_csv.open_csv(self.file_name, read_options=pa_csv.ReadOptions(use_threads=True, block_size=CSV_BLOCK_BYTES),
+                                 convert_options=convert_options)
+        batches, rows = [], 0
+        try:
+            for batch in reader:
+                batches.append(batch)
+                rows += batch.num_rows
+                self._report(progress, rows)
+        except pyarrow.ArrowInvalid:
+            # The stream fixes column types from its first block; a later block that does not fit
+            # them (integers, then decimals) needs the whole-file type inference of read_csv
+            del batches
+            if progress is not None:
+                progress("Column types change part way through the file; reading it again")
+            return pa_csv.read_csv(self.file_name, read_options=pa_csv.ReadOptions(use_threads=True),
+                                   convert_options=convert_options).to_pandas()
+        return pyarrow.Table.from_batches(batches, schema=reader.schema).to_pandas()
+
+class ParquetSource(DataSource):
+    def __init__(self, file_name, preview_rows=PREVIEW_ROWS):
+        _require_pyarrow("Parquet")
+        super().__init__(file_name, preview_rows)
+        parquet_file = pa_parquet.ParquetFile(file_name)
+        self.columns = list(parquet_file.schema_arrow.names)
+        self.n_rows = parquet_file.metadata.num_rows
+        # Read in column groups: the reader's buffers for thousands of columns at once take far more
+        # memory than the preview rows themselves
+        rows = self._preview_rows(len(self.columns))
+        batches = [next(parquet_file.iter_batches(batch_size=rows, columns=self.columns[start:start + PREVIEW_COLUMN_GROUP]), None)
+                   for start in range(0, len(self.columns), PREVIEW_COLUMN_GROUP)]
+        if batches and batches[0] is not None:
+            self.preview = concat([batch.to_pandas() for batch in batches], axis=1)
+        else:
+            self.preview = parquet_file.schema_arrow.empty_table().to_pandas()
+
+    def _read_columns(self, columns, progress=None):
+        # A row group at a time; the columns of each group are still decoded in parallel
+        parquet_file = pa_parquet.ParquetFile(self.file_name)
+        tables, rows = [], 0
+        for i in range(parquet_file.num_row_groups):
+            tables.append(parquet_file.read_row_group(i, columns=columns))
+            rows += tables[-1].num_rows
+            self._report(progress, rows)
+        if not tables:
+            return parquet_file.schema_arrow.empty_table().select(columns).to_pandas()
+        return pyarrow.concat_tables(tables).to_pandas()
+
+class FeatherSource(DataSource):
+    def __init__(self, file_name, preview_rows=PREVIEW_ROWS):
+        _require_pyarrow("Feather")
+        super().__init__(file_name, preview_rows)
+        reader = self._open()
+        self.columns = list(reader.schema.names)
+        # Compressed batches are decompressed for every column read, so the rows are counted on one
+        # column and the preview is read in column groups
+        counter = self._open([0]) if self.columns else reader
+        self.n_rows = sum(counter.get_batch(i).num_rows for i in range(counter.num_record_batches))
+        preview_rows = self._preview_rows(len(self.columns))
+        parts = []
+        for start in range(0, len(self.columns), PREVIEW_COLUMN_GROUP):
+            group = self._open(list(range(start, min(start + PREVIEW_COLUMN_GROUP, len(self.columns)))))
+            batches, rows = [], 0
+            for i in range(group.num_record_batches):
+                if rows >= preview_rows:
+                    break
+                batches.append(group.get_batch(i))
+                rows += batches[-1].num_rows
+            if batches:
+                parts.append(pyarrow.Table.from_batches(batches).slice(0, preview_rows).to_pandas())
+        self.preview = concat(parts, axis=1) if parts else reader.schema.empty_table().to_pandas()
+
+    def _open(self, fields=None):
+        options = pa_ipc.IpcReadOptions(included_fields=fields) if fields is not None else None
+        return pa_ipc.open_file(pyarrow.memory_map(self.file_name), options=options)
+
+    def _read_columns(self, columns, progress=None):
+        # Record batches of the memory-mapped file, zero-copy unless compressed
+        positions = {column: i for i, column in enumerate(self.columns)}
+        reader = self._open(sorted(positions[column] for column in columns))
+        batches, rows = [], 0
+        for i in range(reader.num_record_batches):
+            batches.append(reader.get_batch(i))
+            rows += batches[-1].num_rows
+            self._report(progress, rows)
+        table = pyarrow.Table.from_batches(batches) if batches else reader.schema.empty_table()
+        return table.select(columns).to_pandas()
+
+class NpySource(DataSource):
+    def __init__(self, file_name, preview_rows=PREVIEW_ROWS):
+        super().__init__(file_name, preview_rows)
+        # Read-only memory map: nothing is paged in until a column is used
+        self.array = np_load(file_name, mmap_mode='r')
+        if self.array.dtype.names:
+            self.columns = list(self.array.dtype.names)
+        elif self.array.ndim == 2:
+            self.columns = [f"col{i}" for i in range(self.array.shape[1])]
+        else:
+            raise ValueError(f"Expected a 2-D or structured array in {file_name}, got shape {self.array.shape}")
+        self._positions = {column: i for i, column in enumerate(self.columns)}
+        self.n_rows = self.array.shape[0]
+        self.preview = self._to_frame(self.columns, self.array[:self._preview_rows(len(self.columns))])
+
+    def _to_frame(self, columns, array):
+        if array.dtype.names:
+            return DataFrame({c: array[c] for c in columns})
+        return DataFrame({c: array[:, self._positions[c]] for c in columns})
+
+    def _read_columns(self, columns, progress=None):
+        return self._to_frame(columns, self.array)
+
+class SparseNpzSource(DataSource):
+    # scipy.sparse.save_npz files; an optional 'columns' array in the same archive names the columns
+    def __init__(self, file_name, preview_rows=PREVIEW_ROWS):
+        from scipy.sparse import load_npz
+        super().__init__(file_name, preview_rows)
+        self.matrix = load_npz(file_name).tocsc()
+        with np_load(file_name, allow_pickle=False) as archive:
+            names = archive['columns'] if 'columns' in archive.files else None
+        n_columns = self.matrix.shape[1]
+        self.columns = [str(c) for c in names] if names is not None else [f"col{i}" for i in range(n_columns)]
+        self._positions = {column: i for i, column in enumerate(self.columns)}
+        self.n_rows = self.matrix.shape[0]
+
+        self.preview = DataFrame(self.matrix[:self._preview_rows(n_columns)].toarray(), columns=self.columns)
+
+    def _read_columns(self, columns, progress=None):
+        # Pandas sparse columns, built from the nonzeros of the selected columns only
+        block = self.matrix[:, [self._positions[c] for c in columns]]
+        return DataFrame.sparse.from_spmatrix(block, columns=columns)
+
+LOADERS = {
+    '.csv': CSVSource,
+    '.txt': CSVSource,
+    '.parquet': ParquetSource,
+    '.pq': ParquetSource,
+    '.feather': FeatherSource,
+    '.arrow': FeatherSource,
+    '.npy': NpySource,
+    '.npz': SparseNpzSource,
+}
+
+FILE_FILTER = "Data Files (*.csv *.parquet *.pq *.feather *.arrow *.npy *.npz);;CSV Files (*.csv);;All Files (*)"
+
+def open_source(file_name, preview_rows=PREVIEW_ROWS):
+    loader = LOADERS.get(splitext(file_name)[1].lower(), CSVSource)
+    return loader(file_name, preview_rows)
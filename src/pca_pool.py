@@ -0,0 +1,29 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+# Process pools shared by rank selection and the sharded fit
+
+_limits = []
+
+def limit_worker_threads():
+    # One BLAS thread and one Arrow CPU thread per worker; the pool already uses every core
+    try:
+        from threadpoolctl import threadpool_limits
+        _limits.append(threadpool_limits(1))
+    except ImportError:
+        pass
+    try:
+        import pyarrow
+        pyarrow.set_cpu_count(1)
+    except ImportError:
+        pass
+
+def _initialize(initializer, initargs):
+    limit_worker_threads()
+    if initializer is not None:
+        initializer(*initargs)
+
+def spawn_pool(n_jobs, initializer=None, initargs=()):
+    # Spawned rather than forked: the GUI calls into worker threads of a Qt process
+    return ProcessPoolExecutor(max_workers=n_jobs, mp_context=get_context('spawn'),
+                               initializer=_initialize, initargs=(initializer, initargs))
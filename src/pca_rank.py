@@ -0,0 +1,173 @@
+from concurrent.futures import as_completed
+from multiprocessing import shared_memory
+from os import cpu_count
+from numpy import ndarray, asarray, float64, zeros, quantile as np_quantile, sqrt, arange, array_split, argmax
+from numpy.random import default_rng
+from .pca_calc import PCACalculator, StreamingMoments
+from .pca_pool import spawn_pool
+
+# Component-count selection: parallel analysis (permuted-column null spectra) and k-fold
+# cross-validation of the reconstruction error, both spread over a process pool.
+# Workers map one shared read-only copy of the data instead of receiving it pickled.
+
+N_PERMUTATIONS = 100
+N_FOLDS = 5
+MAX_COMPONENTS = 50
+
+_shared = {}
+
+def _attach(name, shape, dtype):
+    # Pool initializer: map the parent's buffer once per worker process
+    memory = shared_memory.SharedMemory(name=name)
+    X = ndarray(shape, dtype=dtype, buffer=memory.buf)
+    X.flags.writeable = False
+    _shared['memory'] = memory
+    _shared['X'] = X
+
+def _data():
+    return _shared['X']
+
+def eigenvalues(X):
+    # Correlation-matrix eigenvalues, largest first
+    calculator = PCACalculator()
+    calculator.fit_moments(StreamingMoments().update(X))
+    return calculator.explained_variance
+
+def _null_spectra(seeds):
+    X = _data()
+    # Permuting every column independently keeps the marginals but destroys the correlations
+    return [eigenvalues(default_rng(seed).permuted(X, axis=0)) for seed in seeds]
+
+def fold_rows(n_rows, n_folds, fold, seed):
+    rows = default_rng(seed).permutation(n_rows)
+    test = rows[fold::n_folds]
+    train = zeros(n_rows, dtype=bool)
+    train[rows] = True
+    train[test] = False
+    return train.nonzero()[0], test
+
+def _fold_press(fold, n_folds, max_components, seed, chunksize=65_536):
+    X = _data()
+    train, test = fold_rows(X.shape[0], n_folds, fold, seed)
+    calculator = PCACalculator()
+    calculator.fit_moments(StreamingMoments().update(X[train]), max_components)
+    components = calculator.get_components()
+
+    # Held-out rows are standardized with the training statistics. The error of each value is
+    # the residual of the rank-k reconstruction divided by (1 - h_j), with h_j the squared norm
+    # of variable j's loadings: the leave-one-variable-out residual, so the error is not
+    # minimized trivially by keeping every component
+    press = zeros(max_components + 1)
+    for start in range(0, len(test), chunksize):
+        Z = (X[test[start:start + chunksize]] - calculator.mean) / calculator.scale
+        residual = Z.copy()
+        leverage = zeros(Z.shape[1])
+        press[0] += (Z ** 2).sum()
+        for k in range(max_components):
+            loading = components[k]
+            residual -= (Z @ loading)[:, None] * loading
+            leverage += loading ** 2
+            press[k + 1] += ((residual / (1.0 - leverage)) ** 2).sum()
+    return fold, press / (len(test) * X.shape[1])
+
+def _run(tasks, name, shape, dtype, n_jobs, progress):
+    results = []
+    pool = spawn_pool(n_jobs, _attach, (name, shape, dtype))
+    try:
+        futures = {pool.submit(fn, *args): kind for kind, fn, args in tasks}
+        for done, future in enumerate(as_completed(futures), 1):
+            results.append((futures[future], future.result()))
+            if progress is not None:
+                progress(f"Rank selection: {done}/{len(futures)} tasks done")
+    except BaseException:
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+    return results
+
+def select_rank(X, max_components=None, n_permutations=N_PERMUTATIONS, n_folds=N_FOLDS, quantile=0.95,
+                n_jobs=None, seed=0, progress=None):
+    X = asarray(X, dtype=float64)
+    n_rows, n_features = X.shape
+    if n_features < 2 or n_rows < 2 * n_folds:
+        raise ValueError(f"Rank selection needs at least 2 columns and {2 * n_folds} rows")
+    # Rank p leaves nothing to predict a held-out variable from, so p - 1 is the ceiling
+    limit = min(n_features - 1, n_rows - n_rows // n_folds - 1)
+    max_components = min(max_components or MAX_COMPONENTS, limit)
+    n_jobs = max(1, n_jobs or cpu_count() or 1)
+
+    observed = eigenvalues(X)
+    seeds = [seed + 1 + i for i in range(n_permutations)]
+    tasks = [('null', _null_spectra, (list(batch),)) for batch in array_split(seeds, min(len(seeds), 2 * n_jobs)) if len(batch)] \
+        + [('press', _fold_press, (fold, n_folds, max_components, seed)) for fold in range(n_folds)]
+
+    if n_jobs == 1:
+        # In process, on the caller's array
+        _shared['X'] = X
+        try:
+            results = []
+            for done, (kind, fn, args) in enumerate(tasks, 1):
+                results.append((kind, fn(*args)))
+                if progress is not None:
+                    progress(f"Rank selection: {done}/{len(tasks)} tasks done")
+        finally:
+            _shared.pop('X', None)
+    else:
+        memory = shared_memory.SharedMemory(create=True, size=X.nbytes)
+        try:
+            ndarray(X.shape, dtype=float64, buffer=memory.buf)[:] = X
+            results = _run(tasks, memory.name, X.shape, float64, n_jobs, progress)
+        finally:
+            memory.close()
+            memory.unlink()
+
+    null = asarray([spectrum for kind, batch in results if kind == 'null' for spectrum in batch])
+    press_by_fold = dict(result for kind, result in results if kind == 'press')
+    press = asarray([press_by_fold[fold] for fold in range(n_folds)])
+    return _summarize(observed, null, press, max_components, quantile)
+
+def _summarize(observed, null, press, max_components, quantile):
+    components = arange(1, max_components + 1)
+    observed = observed[:max_components]
+    alpha = 1.0 - quantile
+
+    # Parallel analysis: keep leading components whose eigenvalue beats the null quantile
+    null = null[:, :max_components]
+    threshold = np_quantile(null, quantile, axis=0)
+    above = observed > threshold
+    pa_rank = int(argmax(~above)) if not above.all() else max_components
+
+    # Cross-validation: the smallest rank within one standard error of the best error
+    press_mean = press.mean(axis=0)
+    press_se = press.std(axis=0, ddof=1) / sqrt(press.shape[0]) if press.shape[0] > 1 else zeros(press.shape[1])
+    best = int(press_mean.argmin())
+    within = (press_mean <= press_mean[best] + press_se[best]).nonzero()[0]
+    cv_rank = int(within[0])
+
+    return {
+        # Both tests have to support a component for it to be recommended
+        'recommended_rank': min(pa_rank, cv_rank),
+        'max_components': max_components,
+        'parallel_analysis': {
+            'rank': pa_rank,
+            'components': components,
+            'eigenvalues': observed,
+            'null_lower': np_quantile(null, alpha / 2, axis=0),
+            'null_median': np_quantile(null, 0.5, axis=0),
+            'null_upper': np_quantile(null, 1.0 - alpha / 2, axis=0),
+            'threshold': threshold,
+            'quantile': quantile,
+            'n_permutations': null.shape[0],
+        },
+        'cross_validation': {
+            'rank': cv_rank,
+            'best_rank': best,
+            'rank_range': (int(within[0]), int(within[-1])),
+            'components': arange(0, max_components + 1),
+            'press_mean': press_mean,
+            'press_se': press_se,
+            'press_lower': press_mean - press_se,
+            'press_upper': press_mean + press_se,
+            'n_folds': press.shape[0],
+        },
+    }
@@ -0,0 +1,310 @@
+import asyncio
+import json
+import sys
+from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from numpy import asarray, float64, vstack, percentile
+from .pca_calc import PCACalculator
+
+# Local scoring service: concurrent transform requests are coalesced into one matrix multiply.
+# Headless like pca_cli: this module must never import PyQt6 or matplotlib
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+BATCH_WINDOW = 0.002
+MAX_BATCH_ROWS = 65_536
+MAX_BODY_BYTES = 64 * 1024 ** 2
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+           500: 'Internal Server Error'}
+
+class ScoringService:
+    def __init__(self, calculator, columns, batch_window=BATCH_WINDOW, max_batch_rows=MAX_BATCH_ROWS,
+                 latency_samples=10_000):
+        if calculator.get_components() is None:
+            raise ValueError("The calculator has not been fitted")
+        self.calculator = calculator
+        self.columns = list(columns)
+        # How long the first request of a batch waits for others to join it
+        self.batch_window = batch_window
+        self.max_batch_rows = max_batch_rows
+
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.failed = 0
+        self.started = None
+        self._latencies = deque(maxlen=latency_samples)
+        self._queue = None
+        self._batcher = None
+        # One thread: batches run back to back while the loop keeps accepting the next one
+        self._executor = None
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pca-score")
+        self._batcher = asyncio.get_running_loop().create_task(self._run_batches())
+        self.started = perf_counter()
+
+    async def stop(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            self._batcher = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _prepare(self, rows, columns=None):
+        X = asarray(rows, dtype=float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.ndim != 2:
+            raise ValueError(f"Expected rows as a 2-D array, got {X.ndim} dimensions")
+        if columns is not None:
+            # Rows given in another column order are reordered to the model's
+            positions = {str(column): i for i, column in enumerate(columns)}
+            missing = [column for column in self.columns if column not in positions]
+            if missing:
+                raise ValueError(f"Columns missing from the request: {', '.join(missing)}")
+            if X.shape[1] != len(columns):
+                raise ValueError(f"Rows have {X.shape[1]} values but {len(columns)} columns were named")
+            X = X[:, [positions[column] for column in self.columns]]
+        if X.shape[1] != len(self.columns):
+            raise ValueError(f"Rows need {len(self.columns)} values ({', '.join(self.columns)}), got {X.shape[1]}")
+        return X
+
+    async def score(self, rows, columns=None):
+        if self._queue is None:
+            raise RuntimeError("The service has not been started")
+        X = self._prepare(rows, columns)
+        start = perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((X, future))
+        scores = await future
+        self._latencies.append(perf_counter() - start)
+        self.requests += 1
+        self.rows += X.shape[0]
+        return scores
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        n_rows = batch[0][0].shape[0]
+        deadline = loop.time() + self.batch_window
+        while n_rows < self.max_batch_rows:
+            timeout = deadline - loop.time()
+            if timeout <= 0 and self._queue.empty():
+                break
+            try:
+                item = self._queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            n_rows += item[0].shape[0]
+        return batch
+
+    async def _run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            X = vstack([rows for rows, _ in batch]) if len(batch) > 1 else batch[0][0]
+            try:
+                # The math runs off the event loop; numpy releases the GIL for the multiply
+                scores = await loop.run_in_executor(self._executor, self.calculator.transform, X)
+            except Exception as e:
+                self.failed += len(batch)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            offset = 0
+            for rows, future in batch:
+                if not future.done():
+                    future.set_result(scores[offset:offset + rows.shape[0]])
+                offset += rows.shape[0]
+
+    def get_stats(self):
+        elapsed = perf_counter() - self.started if self.started is not None else 0.0
+        stats = {
+            'uptime': elapsed,
+            'requests': self.requests,
+            'rows': self.rows,
+            'batches': self.batches,
+            'failed': self.failed,
+            'mean_batch_requests': self.requests / self.batches if self.batches else 0.0,
+            'requests_per_second': self.requests / elapsed if elapsed > 0 else 0.0,
+            'rows_per_second': self.rows / elapsed if elapsed > 0 else 0.0,
+            'latency_ms': None,
+        }
+        if self._latencies:
+            latencies = asarray(self._latencies) * 1000
+            p50, p90, p99 = percentile(latencies, [50, 90, 99])
+            stats['latency_ms'] = {'p50': p50, 'p90': p90, 'p99': p99, 'max': latencies.max(),
+                                   'samples': len(latencies)}
+        return stats
+
+    def get_info(self):
+        return {
+            'status': 'ok',
+            'columns': self.columns,
+            'n_components': self.calculator.get_n_components(),
+            'solver': self.calculator.get_solver(),
+            'batch_window_ms': self.batch_window * 1000,
+            'max_batch_rows': self.max_batch_rows,
+        }
+
+    async def _route(self, method, path, body):
+        if path == '/transform':
+            if method != 'POST':
+                return 405, {'error': "Use POST"}
+            try:
+                request = json.loads(body or b'{}')
+                scores = await self.score(request['rows'], request.get('columns'))
+            except (ValueError, KeyError, TypeError) as e:
+                return 400, {'error': f"{type(e).__name__}: {e}"}
+            return 200, {'scores': scores.tolist()}
+        if path in ('/stats', '/health'):
+            if method != 'GET':
+                return 405, {'error': "Use GET"}
+            return 200, self.get_stats() if path == '/stats' else self.get_info()
+        return 404, {'error': f"Unknown path {path}"}
+
+    async def handle(self, reader, writer):
+        # Minimal HTTP/1.1 with keep-alive; JSON in and out
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0) or 0)
+                keep_alive = len(parts) == 3 and parts[2] == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                if len(parts) != 3:
+                    status, payload = 400, {'error': "Malformed request line"}
+                    keep_alive = False
+                elif length > MAX_BODY_BYTES:
+                    status, payload = 413, {'error': f"Bodies are limited to {MAX_BODY_BYTES} bytes"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    try:
+                        status, payload = await self._route(parts[0], parts[1].split('?')[0], body)
+                    except Exception as e:
+                        status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                    .encode('latin-1') + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+async def start_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_socket=None):
+    # Started service plus a listening server; port=0 picks a free port
+    await service.start()
+    if unix_socket is not None:
+        return await asyncio.start_unix_server(service.handle, path=unix_socket)
+    return await asyncio.start_server(service.handle, host, port)
+
+async def request(method, path, payload=None, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_socket=None):
+    # Small client for scripts and tests; returns (status, decoded JSON)
+    if unix_socket is not None:
+        reader, writer = await asyncio.open_unix_connection(unix_socket)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    try:
+        body = json.dumps(payload).encode() if payload is not None else b''
+        writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value)
+        return status, json.loads(await reader.readexactly(length))
+    finally:
+        writer.close()
+
+def build_parser():
+    parser = ArgumentParser(prog="pca_entry.py serve", description="Serve PCA projections of a saved model")
+    parser.add_argument("model", help="Model file written by Save Model / PCAInterface.save_model (.npz)")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("-p", "--port", type=int, default=DEFAULT_PORT, help=f"TCP port (default: {DEFAULT_PORT})")
+    parser.add_argument("--unix-socket", default=None, help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--batch-window-ms", type=float, default=BATCH_WINDOW * 1000,
+                        help=f"How long a request waits for others to batch with (default: {BATCH_WINDOW * 1000:g})")
+    parser.add_argument("--max-batch-rows", type=int, default=MAX_BATCH_ROWS,
+                        help=f"Rows per batched multiply (default: {MAX_BATCH_ROWS})")
+    parser.add_argument("--stats-interval", type=float, default=0,
+                        help="Print throughput and latency every N seconds (default: off)")
+    return parser
+
+def format_stats(stats):
+    text = (f"{stats['requests']} requests, {stats['rows']} rows in {stats['batches']} batches "
+            f"({stats['requests_per_second']:.1f} req/s, {stats['rows_per_second']:.0f} rows/s)")
+    if stats['latency_ms'] is not None:
+        latency = stats['latency_ms']
+        text += f", latency p50 {latency['p50']:.2f} ms, p90 {latency['p90']:.2f} ms, p99 {latency['p99']:.2f} ms"
+    return text
+
+async def _serve(args, service):
+    server = await start_server(service, args.host, args.port, args.unix_socket)
+    where = args.unix_socket or f"http://{args.host}:{server.sockets[0].getsockname()[1]}"
+    print(f"Serving {len(service.columns)} columns -> {service.calculator.get_n_components()} components on {where}")
+    async def report():
+        while True:
+            await asyncio.sleep(args.stats_interval)
+            print(format_stats(service.get_stats()), flush=True)
+
+    reporter = asyncio.get_running_loop().create_task(report()) if args.stats_interval > 0 else None
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if reporter is not None:
+            reporter.cancel()
+        await service.stop()
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    calculator = PCACalculator()
+    columns = calculator.load(args.model)
+    service = ScoringService(calculator, columns, args.batch_window_ms / 1000, args.max_batch_rows)
+    try:
+        asyncio.run(_serve(args, service))
+    except KeyboardInterrupt:
+        pass
+    print(format_stats(service.get_stats()))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+from concurrent.futures import as_completed
+from os import cpu_count, close, remove
+from os.path import splitext
+from tempfile import mkstemp
+from time import perf_counter
+from numpy import float64
+from pandas import DataFrame
+from .pca_calc import PCACalculator, StreamingMoments, TRANSFORM_CHUNK_ROWS
+from .pca_loaders import open_source
+from .pca_pool import spawn_pool
+from .pca_export import FORMATS_BY_EXTENSION, build_metadata, write_scores
+
+# Map-reduce fit over row shards of one dataset (e.g. dozens of CSV files with the same columns).
+# Map: each worker reduces a shard to its count, column means and co-moment matrix. Reduce: the
+# partial moments are merged pairwise and the correlation matrix is decomposed once. A second
+# parallel pass projects every shard with the merged model.
+
+def _read_shard(file_name, columns, label_column=None):
+    source = open_source(file_name, preview_rows=100)
+    wanted = columns + ([label_column] if label_column else [])
+    missing = [column for column in wanted if column not in source.columns]
+    if missing:
+        raise ValueError(f"{file_name} is missing columns: {', '.join(map(str, missing))}")
+    return source.load_columns(wanted)
+
+def shard_moments(file_name, columns, chunksize=TRANSFORM_CHUNK_ROWS):
+    df = _read_shard(file_name, columns)
+    moments = StreamingMoments(len(columns))
+    for start in range(0, len(df), chunksize):
+        moments.update(df.iloc[start:start + chunksize][columns].to_numpy(dtype=float64))
+    return moments
+
+def merge_moments(parts):
+    # Pairwise tree: each merge combines partials over similar row counts, which keeps the
+    # rounding error of the combined co-moments low however many shards there are
+    parts = list(parts)
+    if not parts:
+        raise ValueError("No shards to merge")
+    while len(parts) > 1:
+        parts = [parts[i].merge(parts[i + 1]) if i + 1 < len(parts) else parts[i] for i in range(0, len(parts), 2)]
+    return parts[0]
+
+def project_shard(file_name, columns, model_file, label_column=None, output_file=None, chunksize=TRANSFORM_CHUNK_ROWS):
+    # Scores of one shard as a frame, or written to output_file (returning the row count): CSV, or
+    # Parquet, Feather or NPY by the file's extension
+    calculator = PCACalculator()
+    calculator.load(model_file)
+    df = _read_shard(file_name, columns, label_column)
+    values = calculator.transform(df[columns].to_numpy(dtype=float64), chunksize)
+    fmt = FORMATS_BY_EXTENSION.get(splitext(output_file)[1].lower()) if output_file is not None else None
+    if fmt is not None:
+        metadata = build_metadata(calculator, columns, label_column, len(values))
+        write_scores(output_file, values, df[label_column].values if label_column else None, fmt, metadata)
+        return len(values)
+    scores = DataFrame(values, columns=[f"PC{i+1}" for i in range(values.shape[1])], copy=False)
+    if label_column:
+        scores['label'] = df[label_column].values
+    if output_file is None:
+        return scores
+    scores.to_csv(output_file, index=False)
+    return len(scores)
+
+def _map(pool, fn, tasks, stage, progress):
+    # Results in task order; inline when there is no pool
+    if pool is None:
+        results = []
+        for done, args in enumerate(tasks, 1):
+            results.append(fn(*args))
+            if progress is not None:
+                progress(f"{stage}: {done}/{len(tasks)} shards done")
+        return results
+
+    futures = {pool.submit(fn, *args): i for i, args in enumerate(tasks)}
+    results = [None] * len(tasks)
+    for done, future in enumerate(as_completed(futures), 1):
+        results[futures[future]] = future.result()
+        if progress is not None:
+            progress(f"{stage}: {done}/{len(tasks)} shards done")
+    return results
+
+def fit_shards(files, columns, n_components=2, label_column=None, output_files=None, n_jobs=None, progress=None):
+    # Returns the fitted calculator, the merged moments, and per shard either its scores frame or,
+    # with output_files (one path per shard), the number of rows written there
+    files = list(files)
+    columns = list(columns)
+    if not files:
+        raise ValueError("No shards given")
+    if output_files is not None and len(output_files) != len(files):
+        raise ValueError(f"Expected {len(files)} output files, got {len(output_files)}")
+    n_jobs = max(1, min(n_jobs or cpu_count() or 1, len(files)))
+
+    pool = None
+    if n_jobs > 1:
+        pool = spawn_pool(n_jobs)
+    handle, model_file = mkstemp(suffix='.npz')
+    close(handle)
+    try:
+        start = perf_counter()
+        parts = _map(pool, shard_moments, [(file_name, columns) for file_name in files], "Moments", progress)
+        shard_rows = [part.count for part in parts]
+        moments = merge_moments(parts)
+        calculator = PCACalculator()
+        calculator.fit_moments(moments, n_components)
+        calculator.solver = 'sharded'
+        calculator.fit_time = perf_counter() - start
+
+        # Workers load the merged model from a temporary file in the saved-model format
+        start = perf_counter()
+        calculator.save(model_file, columns)
+        tasks = [(file_name, columns, model_file, label_column, None if output_files is None else output_files[i])
+                 for i, file_name in enumerate(files)]
+        scores = _map(pool, project_shard, tasks, "Projection", progress)
+        project_time = perf_counter() - start
+    except BaseException:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+            pool = None
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        remove(model_file)
+
+    return {
+        'calculator': calculator,
+        'moments': moments,
+        'shard_rows': shard_rows,
+        'scores': scores,
+        'fit_time': calculator.fit_time,
+        'project_time': project_time,
+        'n_jobs': n_jobs,
+    }
@@ -0,0 +1,124 @@
+import sys
+import json
+from argparse import ArgumentParser
+from contextlib import contextmanager
+from importlib import import_module
+from os import environ
+from threading import Thread
+from time import perf_counter
+
+# Kept out of the import path to the main window; loaded on first PCA run or plot
+DEFERRED_PACKAGES = ('sklearn', 'matplotlib')
+WARMUP_MODULES = (
+    'sklearn.preprocessing',
+    'sklearn.decomposition',
+    'sklearn.metrics.pairwise',
+    'matplotlib.figure',
+    'mpl_toolkits.mplot3d',
+    'matplotlib.backends.backend_qt5agg',
+)
+STARTUP_REPORT_ENV = 'PCA_STARTUP_REPORT'
+WARMUP_ENV = 'PCA_WARMUP'
+
+class StartupTimer:
+    def __init__(self):
+        self.origin = perf_counter()
+        self.entries = []
+        self.total = None
+
+    @contextmanager
+    def stage(self, name, kind='stage'):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.entries.append((kind, name, perf_counter() - start))
+
+    def timed_import(self, name):
+        # Imports are timed in order, so each entry only counts modules not already loaded
+        with self.stage(name, 'import'):
+            return import_module(name)
+
+    def finish(self):
+        self.total = perf_counter() - self.origin
+        return self.total
+
+    def as_dict(self):
+        total = self.total if self.total is not None else perf_counter() - self.origin
+        return {
+            'total': total,
+            'imports': {name: seconds for kind, name, seconds in self.entries if kind == 'import'},
+            'stages': {name: seconds for kind, name, seconds in self.entries if kind == 'stage'},
+            'deferred_loaded': [package for package in DEFERRED_PACKAGES if package in sys.modules],
+        }
+
+    def report(self):
+        timings = self.as_dict()
+        total = timings['total']
+        lines = [f"Time to window: {total * 1000:.0f} ms"]
+        for kind, name, seconds in self.entries:
+            lines.append(f"  {kind:<7} {name:<32} {seconds * 1000:8.1f} ms  {seconds / total:6.1%}")
+        other = total - sum(seconds for _, _, seconds in self.entries)
+        lines.append(f"  {'other':<7} {'':<32} {other * 1000:8.1f} ms  {other / total:6.1%}")
+        loaded = timings['deferred_loaded']
+        lines.append(f"Deferred packages loaded before the window: {', '.join(loaded) if loaded else 'none'}")
+        return '\n'.join(lines)
+
+def warm_up(modules=WARMUP_MODULES):
+    # Background imports so the first PCA run or plot does not pay for them
+    def load():
+        for name in modules:
+            try:
+                import_module(name)
+            except ImportError:
+                pass
+
+    thread = Thread(target=load, name="pca-warmup", daemon=True)
+    thread.start()
+    return thread
+
+def build_parser():
+    parser = ArgumentParser(prog="pca_entry.py", add_help=False)
+    parser.add_argument("--startup-report", nargs="?", const="-", default=environ.get(STARTUP_REPORT_ENV),
+                        help="Print the startup timing report, or write it as JSON to the given path")
+    parser.add_argument("--no-warmup", action="store_true", default=environ.get(WARMUP_ENV) == '0',
+                        help="Do not import scikit-learn and matplotlib in the background once the window is up")
+    return parser
+
+def write_report(timer, target):
+    if target in ('-', '1'):
+        print(timer.report(), file=sys.stderr)
+    else:
+        with open(target, 'w') as f:
+            json.dump(timer.as_dict(), f, indent=2)
+
+def run_gui(argv):
+    timer = StartupTimer()
+    args, qt_args = build_parser().parse_known_args(argv[1:])
+
+    timer.timed_import('PyQt6.QtWidgets')
+    timer.timed_import('numpy')
+    timer.timed_import('pandas')
+    pca_gui = timer.timed_import('src.pca_gui')
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtCore import QTimer
+
+    with timer.stage('create QApplication'):
+        app = QApplication(argv[:1] + qt_args)
+    with timer.stage('build main window'):
+        window = pca_gui.PCACalculatorApp()
+    with timer.stage('show main window'):
+        window.show()
+    shown = perf_counter()
+
+    def window_ready():
+        # First pass of the event loop, after the initial expose and paint
+        timer.entries.append(('stage', 'first paint', perf_counter() - shown))
+        timer.finish()
+        if args.startup_report:
+            write_report(timer, args.startup_report)
+        if not args.no_warmup:
+            warm_up()
+
+    QTimer.singleShot(0, window_ready)
+    return app.exec()
@@ -1,40 +1,94 @@
-from numpy import unique, linspace, cumsum
-from pandas import api
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from PyQt6.QtWidgets import QVBoxLayout, QWidget
-from sklearn.preprocessing import LabelEncoder
+from numpy import cumsum, bincount, log1p, zeros, dstack, float64, arange, lexsort, ceil, maximum, minimum, argsort
+from numpy.random import default_rng
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+
+DENSITY_THRESHOLD = 200_000
+LOD_POINTS = 20_000
+LEGEND_CLASSES = 20
 
 class PCAVisualizer:
-    def __init__(self, pca_interface):
+    def __init__(self, pca_interface, density_threshold=DENSITY_THRESHOLD, lod_points=LOD_POINTS,
+                 legend_classes=LEGEND_CLASSES):
         self.pca_interface = pca_interface
-        self.label_encoder = LabelEncoder()
+        self.instrumentation = pca_interface.instrumentation
+        # Above this many points the 2D plot is drawn as a density image instead of a scatter
+        self.density_threshold = density_threshold
+        # 3D plots larger than this show a stratified subsample while the view is being rotated
+        self.lod_points = lod_points
+        # Legends list at most this many classes, the most frequent ones
+        self.legend_classes = legend_classes
+
+    def _add_legend(self, ax, index, colors, anchor=(1, 0.5)):
+        classes, counts = index['classes'], index['counts']
+        shown = arange(len(classes))
+        title = 'Labels'
+        if self.legend_classes is not None and len(classes) > self.legend_classes:
+            shown = argsort(-counts, kind='stable')[:self.legend_classes]
+            title = f"Labels (top {self.legend_classes} of {len(classes):,})"
+        legend_elements = [Line2D([0], [0], marker='o', color='w', markerfacecolor=colors[i],
+                                  markersize=10, label=classes[i]) for i in shown]
+        ax.legend(handles=legend_elements, title=title, loc='center left', bbox_to_anchor=anchor)
+
+    def _density_grid_shape(self, ax):
+        # One bin per screen pixel of the axes, so drawing cost follows resolution rather than N
+        bbox = ax.get_window_extent()
+        return max(64, min(2048, int(bbox.height))), max(64, min(2048, int(bbox.width)))
 
-    def _prepare_labels(self, labels):
+    def plot_2d_density(self, ax, pca_df):
+        x = pca_df['PC1'].to_numpy(dtype=float64)
+        y = pca_df['PC2'].to_numpy(dtype=float64)
+        ny, nx = self._density_grid_shape(ax)
+        x_min, x_max = x.min(), x.max()
+        y_min, y_max = y.min(), y.max()
+        x_span = (x_max - x_min) or 1.0
+        y_span = (y_max - y_min) or 1.0
+
+        ix = ((x - x_min) / x_span * nx).astype(int).clip(0, nx - 1)
+        iy = ((y - y_min) / y_span * ny).astype(int).clip(0, ny - 1)
+        bins = iy * nx + ix
+        counts = bincount(bins, minlength=nx * ny).reshape(ny, nx)
+        extent = (x_min, x_min + x_span, y_min, y_min + y_span)
+        image_args = dict(extent=extent, origin='lower', aspect='auto', interpolation='nearest')
+
+        labels = pca_df['label'] if 'label' in pca_df.columns else None
+        index = self.pca_interface.get_label_index()
         if labels is None:
-            return None, None
-        
-        if api.types.is_numeric_dtype(labels):
-            return labels, labels
+            image = ax.imshow(log1p(counts), cmap='viridis', **image_args)
+            ax.figure.colorbar(image, ax=ax, label='log(1 + points per bin)')
+        elif index is None:
+            # Mean label value per bin
+            sums = bincount(bins, weights=labels.to_numpy(dtype=float64), minlength=nx * ny).reshape(ny, nx)
+            mean_labels = sums / counts.clip(min=1)
+            mean_labels[counts == 0] = float('nan')
+            image = ax.imshow(mean_labels, cmap='viridis', **image_args)
+            ax.figure.colorbar(image, ax=ax, label='Label (mean per bin)')
         else:
-            encoded_labels = self.label_encoder.fit_transform(labels)
-            return encoded_labels, labels
+            # Per-label density grids composited by their class colors: each channel is the
+            # count-weighted class color, accumulated without materializing one grid per label
+            colors = self.pca_interface.get_label_colors()
+            rgb = zeros((ny, nx, 3))
+            for channel in range(3):
+                rgb[:, :, channel] = bincount(bins, weights=colors[index['codes'], channel], minlength=nx * ny).reshape(ny, nx)
+            rgb /= counts.clip(min=1)[:, :, None]
+            alpha = log1p(counts) / max(log1p(counts.max()), 1e-12)
+            ax.imshow(dstack([rgb, alpha]), **image_args)
+            self._add_legend(ax, index, colors)
 
     def plot_2d(self, ax):
         pca_df = self.pca_interface.get_pca_dataframe()
-        
-        if 'label' in pca_df.columns:
-            encoded_labels, original_labels = self._prepare_labels(pca_df['label'])
-            scatter = ax.scatter(pca_df['PC1'], pca_df['PC2'], c=encoded_labels, cmap='viridis')
-            
-            if original_labels is not None and not api.types.is_numeric_dtype(original_labels):
-                unique_labels = unique(original_labels)
-                legend_elements = [plt.Line2D([0], [0], marker='o', color='w', 
-                                              markerfacecolor=plt.cm.viridis(self.label_encoder.transform([label])[0] / len(unique_labels)), 
-                                              markersize=10, label=label) for label in unique_labels]
-                ax.legend(handles=legend_elements, title='Labels', loc='center left', bbox_to_anchor=(1, 0.5))
+
+        if self.density_threshold is not None and len(pca_df) > self.density_threshold:
+            self.plot_2d_density(ax, pca_df)
+        elif 'label' in pca_df.columns:
+            index = self.pca_interface.get_label_index()
+            if index is not None:
+                colors = self.pca_interface.get_label_colors()
+                ax.scatter(pca_df['PC1'], pca_df['PC2'], c=colors[index['codes']])
+                self._add_legend(ax, index, colors)
             else:
-                plt.colorbar(scatter, ax=ax, label='Label')
+                scatter = ax.scatter(pca_df['PC1'], pca_df['PC2'], c=pca_df['label'], cmap='viridis')
+                ax.figure.colorbar(scatter, ax=ax, label='Label')
         else:
             ax.scatter(pca_df['PC1'], pca_df['PC2'])
         
@@ -42,31 +96,70 @@ class PCAVisualizer:
         ax.set_ylabel('PC2')
         ax.set_title('Two Dimensional PCA')
 
+    def _stratified_sample(self, codes, n_points, class_counts=None):
+        # Same share of every label as the full cloud, at least one point per label
+        if class_counts is None:
+            class_counts = bincount(codes)
+        quotas = minimum(class_counts, maximum(1, ceil(class_counts * n_points / len(codes)).astype(int)))
+        order = lexsort((default_rng(0).random(len(codes)), codes))
+        sorted_codes = codes[order]
+        starts = cumsum(class_counts) - class_counts
+        rank = arange(len(codes)) - starts[sorted_codes]
+        return order[rank < quotas[sorted_codes]]
+
+    def _connect_level_of_detail(self, ax, full_cloud, draw_subsample):
+        # Swap to the subsample while a mouse button is held (rotation/zoom) and back on release.
+        # The subsample is added on press rather than kept hidden: mplot3d cannot draw a hidden
+        # scatter that was never projected
+        lod_clouds = []
+
+        def on_press(event):
+            if event.inaxes is ax and not lod_clouds:
+                full_cloud.set_visible(False)
+                lod_clouds.append(draw_subsample())
+                ax.figure.canvas.draw_idle()
+
+        def on_release(event):
+            if lod_clouds:
+                lod_clouds.pop().remove()
+                full_cloud.set_visible(True)
+                ax.figure.canvas.draw_idle()
+
+        ax.figure.canvas.mpl_connect('button_press_event', on_press)
+        ax.figure.canvas.mpl_connect('button_release_event', on_release)
+
     def plot_3d(self, ax):
         pca_df = self.pca_interface.get_pca_dataframe()
-        
+        x = pca_df['PC1'].to_numpy()
+        y = pca_df['PC2'].to_numpy()
+        z = pca_df['PC3'].to_numpy()
+        codes = zeros(len(pca_df), dtype=int)
+        class_counts = None
+        colors = None
+        color_args = {}
+
+        # All labels go into one draw call with a per-point color array
         if 'label' in pca_df.columns:
-            encoded_labels, original_labels = self._prepare_labels(pca_df['label'])
-            
-            if original_labels is not None and not api.types.is_numeric_dtype(original_labels):
-                unique_labels = unique(original_labels)
-                colors = plt.cm.viridis(linspace(0, 1, len(unique_labels)))
-                
-                for label, color in zip(unique_labels, colors):
-                    mask = original_labels == label
-                    ax.scatter(pca_df.loc[mask, 'PC1'], 
-                               pca_df.loc[mask, 'PC2'], 
-                               pca_df.loc[mask, 'PC3'], 
-                               c=[color], 
-                               label=label)
-                
-                ax.legend(title='Labels', loc='center left', bbox_to_anchor=(1.1, 0.5))
+            index = self.pca_interface.get_label_index()
+            if index is not None:
+                codes, class_counts = index['codes'], index['counts']
+                palette = self.pca_interface.get_label_colors()
+                colors = palette[codes]
+                self._add_legend(ax, index, palette, anchor=(1.1, 0.5))
             else:
-                scatter = ax.scatter(pca_df['PC1'], pca_df['PC2'], pca_df['PC3'], 
-                                     c=encoded_labels, cmap='viridis')
-                plt.colorbar(scatter, ax=ax, label='Label')
-        else:
-            ax.scatter(pca_df['PC1'], pca_df['PC2'], pca_df['PC3'])
+                colors = pca_df['label'].to_numpy(dtype=float64)
+                color_args = dict(cmap='viridis', vmin=colors.min(), vmax=colors.max())
+
+        def draw(index):
+            return ax.scatter(x[index], y[index], z[index], c=None if colors is None else colors[index], **color_args)
+
+        full_cloud = draw(slice(None))
+        if color_args:
+            ax.figure.colorbar(full_cloud, ax=ax, label='Label')
+
+        if self.lod_points is not None and len(pca_df) > self.lod_points:
+            sample = self._stratified_sample(codes, self.lod_points, class_counts)
+            self._connect_level_of_detail(ax, full_cloud, lambda: draw(sample))
         
         ax.set_xlabel('PC1')
         ax.set_ylabel('PC2')
@@ -86,13 +179,18 @@ class PCAVisualizer:
     def visualize(self, is_3d=False):
         n_components = self.pca_interface.pca_calculator.get_n_components()
         
-        fig = plt.figure(figsize=(10, 8))
-        if is_3d and n_components >= 3:
-            ax = fig.add_subplot(111, projection='3d')
-            self.plot_3d(ax)
-        else:
-            ax = fig.add_subplot(111)
-            self.plot_2d(ax)
-        
-        plt.tight_layout()
+        with self.instrumentation.span('visualize', is_3d=is_3d):
+            # A bare Figure (no pyplot) can be built off the GUI thread and is not kept alive by pyplot
+            fig = Figure(figsize=(10, 8))
+            if is_3d and n_components >= 3:
+                ax = fig.add_subplot(111, projection='3d')
+                with self.instrumentation.span('plot_3d'):
+                    self.plot_3d(ax)
+            else:
+                ax = fig.add_subplot(111)
+                with self.instrumentation.span('plot_2d'):
+                    self.plot_2d(ax)
+
+            with self.instrumentation.span('layout'):
+                fig.tight_layout()
         return fig, self.get_explained_variance_text()
\ No newline at end of file
@@ -0,0 +1,120 @@
+from traceback import format_exception_only
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+class TaskCancelled(Exception):
+    pass
+
+class CancelToken:
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def check(self):
+        if self.cancelled:
+            raise TaskCancelled()
+
+class WorkerSignals(QObject):
+    progress = pyqtSignal(int, str)
+    finished = pyqtSignal(int, object)
+    failed = pyqtSignal(int, str)
+    cancelled = pyqtSignal(int)
+
+class Worker(QRunnable):
+    def __init__(self, generation, fn, token):
+        super().__init__()
+        self.generation = generation
+        self.fn = fn
+        self.token = token
+        self.signals = WorkerSignals()
+
+    def report_progress(self, message):
+        self.token.check()
+        self.signals.progress.emit(self.generation, message)
+
+    def run(self):
+        try:
+            result = self.fn(self.token, self.report_progress)
+        except TaskCancelled:
+            self.signals.cancelled.emit(self.generation)
+        except Exception as e:
+            self.signals.failed.emit(self.generation, ''.join(format_exception_only(type(e), e)).strip())
+        else:
+            self.signals.finished.emit(self.generation, result)
+
+class TaskRunner(QObject):
+    # Emitted on the GUI thread, only for the newest task
+    started = pyqtSignal(str)
+    progress = pyqtSignal(str)
+    idle = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # A single worker thread keeps tasks ordered: a superseded task can never
+        # write shared state after the task that replaced it
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.generation = 0
+        self._token = None
+        self._callbacks = None
+        self._workers = {}
+
+    def submit(self, description, fn, on_finished, on_failed=None):
+        # fn(token, progress) runs on the worker thread; the callbacks run on the GUI thread
+        self.cancel(notify=False)
+        self.generation += 1
+        self._token = CancelToken()
+        self._callbacks = (on_finished, on_failed)
+
+        worker = Worker(self.generation, fn, self._token)
+        worker.signals.progress.connect(self._on_progress)
+        worker.signals.finished.connect(self._on_finished)
+        worker.signals.failed.connect(self._on_failed)
+        worker.signals.cancelled.connect(self._on_cancelled)
+        self._workers[self.generation] = worker
+        self.started.emit(description)
+        self.pool.start(worker)
+        return self.generation
+
+    def is_busy(self):
+        return self._token is not None
+
+    def cancel(self, notify=True):
+        if self._token is None:
+            return
+        self._token.cancel()
+        self._token = None
+        self._callbacks = None
+        if notify:
+            self.idle.emit()
+
+    def _is_current(self, generation):
+        return generation == self.generation and self._token is not None
+
+    def _on_progress(self, generation, message):
+        if self._is_current(generation):
+            self.progress.emit(message)
+
+    def _finish(self, generation):
+        self._workers.pop(generation, None)
+        if not self._is_current(generation):
+            return None
+        callbacks = self._callbacks
+        self._token = None
+        self._callbacks = None
+        self.idle.emit()
+        return callbacks
+
+    def _on_finished(self, generation, result):
+        callbacks = self._finish(generation)
+        if callbacks is not None:
+            callbacks[0](result)
+
+    def _on_failed(self, generation, message):
+        callbacks = self._finish(generation)
+        if callbacks is not None and callbacks[1] is not None:
+            callbacks[1](message)
+
+    def _on_cancelled(self, generation):
+        self._finish(generation)
@@ -0,0 +1,5 @@
+import sys
+from os.path import abspath, dirname
+
+# Tests import the app as `src.*`, like pca_entry.py and benchmarks/run_benchmarks.py do
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.pca_calc import PCACalculator, StreamingMoments
+from src.pca_interface import PCAInterface
+
+COLUMNS = [f"c{i}" for i in range(6)]
+
+def batch(rng, n, labels=('a', 'b')):
+    X = rng.standard_normal((n, 3)) @ rng.standard_normal((3, 6)) + 0.1 * rng.standard_normal((n, 6))
+    df = pd.DataFrame(X, columns=COLUMNS)
+    df['lab'] = rng.choice(labels, n)
+    return df
+
+def fit_all(*frames):
+    calculator = PCACalculator()
+    calculator.fit_moments(StreamingMoments().update(pd.concat(frames)[COLUMNS].to_numpy()), 3)
+    return calculator
+
+@pytest.mark.parametrize('solver', ['auto', 'full'])
+def test_partial_fit_matches_full_fit(solver):
+    rng = np.random.default_rng(0)
+    history, new = batch(rng, 4000), batch(rng, 1000)
+    calculator = PCACalculator()
+    calculator.fit_transform(history[COLUMNS].to_numpy(), 3, solver)
+    calculator.moments = StreamingMoments().update(history[COLUMNS].to_numpy())
+    calculator.partial_fit(new[COLUMNS].to_numpy())
+    expected = fit_all(history, new)
+    np.testing.assert_allclose(calculator.explained_variance, expected.explained_variance, rtol=1e-12)
+    np.testing.assert_allclose(np.abs(calculator.components), np.abs(expected.components), atol=1e-12)
+
+def test_append_scores_new_rows_with_updated_model():
+    rng = np.random.default_rng(1)
+    history = batch(rng, 3000)
+    interface = PCAInterface()
+    interface.load_data(history, COLUMNS, 'lab')
+    interface.run_pca(3)
+    old_scores = interface.pca_results.copy()
+    for _ in range(3):
+        new = batch(rng, 500)
+        results = interface.append_data(new)
+        np.testing.assert_allclose(interface.pca_results[-500:], interface.pca_calculator.transform(new[COLUMNS].to_numpy()),
+                                   atol=1e-12)
+    assert results['rows_added'] == 500 and results['rows_seen'] == 4500
+    np.testing.assert_array_equal(interface.pca_results[:3000], old_scores)
+    assert len(interface.labels) == 4500 and list(interface.labels[-500:]) == list(new['lab'])
+
+def test_append_categorical_labels():
+    rng = np.random.default_rng(2)
+    history = batch(rng, 1000)
+    history['lab'] = history['lab'].astype('category')
+    interface = PCAInterface()
+    interface.load_data(history, COLUMNS, 'lab')
+    interface.run_pca(2)
+    batches = [batch(rng, 200), batch(rng, 200, ('b', 'c')), batch(rng, 200)]
+    batches[0]['lab'] = batches[0]['lab'].astype('category')
+    for new in batches:
+        interface.append_data(new)
+    labels = interface.labels
+    assert isinstance(labels, pd.Categorical)
+    assert list(labels.categories) == ['a', 'b', 'c']
+    assert list(labels) == list(pd.concat([history['lab'].astype(object)] + [new['lab'] for new in batches]))
+    index = interface.get_label_index()
+    assert list(index['classes']) == ['a', 'b', 'c'] and index['counts'].sum() == 1600
+
+def test_append_extension_array_labels():
+    rng = np.random.default_rng(3)
+    history = batch(rng, 500)
+    history['lab'] = history['lab'].astype('string')
+    interface = PCAInterface()
+    interface.load_data(history, COLUMNS, 'lab')
+    interface.run_pca(2)
+    new = batch(rng, 100)
+    new['lab'] = new['lab'].astype('string')
+    interface.append_data(new)
+    assert list(interface.labels) == list(history['lab']) + list(new['lab'])
+
+def test_reproject_covers_earlier_appends():
+    rng = np.random.default_rng(4)
+    history = batch(rng, 100)
+    interface = PCAInterface()
+    interface.load_data(history, COLUMNS, 'lab')
+    interface.run_pca(2)
+    first, second = batch(rng, 20), batch(rng, 30)
+    interface.append_data(first)
+    interface.append_data(second, reproject=True)
+    assert interface.pca_results.shape == (150, 2) and len(interface.labels) == 150
+    everything = pd.concat([history, first, second])
+    np.testing.assert_allclose(interface.pca_results, interface.pca_calculator.transform(everything[COLUMNS].to_numpy()),
+                               atol=1e-12)
+    assert len(interface.get_pca_dataframe()) == 150
+    # A refit starts a new history
+    interface.run_pca(2)
+    interface.append_data(batch(rng, 10), reproject=True)
+    assert interface.pca_results.shape == (110, 2)
+
+def test_reproject_rejects_other_loaded_rows():
+    rng = np.random.default_rng(5)
+    interface = PCAInterface()
+    interface.load_data(batch(rng, 100), COLUMNS)
+    interface.run_pca(2)
+    interface.load_data(batch(rng, 80), COLUMNS)
+    with pytest.raises(ValueError, match='no longer matches'):
+        interface.append_data(batch(rng, 10), reproject=True)
@@ -0,0 +1,116 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from src.pca_calc import PCACalculator, StreamingMoments
+from src.pca_interface import PCAInterface
+
+COLUMNS = ['a', 'b', 'c', 'd']
+
+def frame(seed, n=400):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.standard_normal((n, 4)) @ rng.standard_normal((4, 4)), columns=COLUMNS)
+    df['lab'] = rng.choice(['x', 'y'], n)
+    return df
+
+def full_fit(df, columns=COLUMNS, n_components=2):
+    calculator = PCACalculator()
+    calculator.fit_transform(df[columns].to_numpy(), n_components, 'full')
+    return calculator
+
+def test_repeat_runs_and_equal_copies_are_cached():
+    df = frame(0)
+    interface = PCAInterface()
+    interface.load_data(df, COLUMNS, 'lab')
+    assert not interface.run_pca(2)['cached']
+    assert interface.run_pca(2)['cached']
+    # Lower ranks are sliced from the cached fit
+    assert interface.run_pca(1)['cached']
+    interface.load_data(df.copy(), COLUMNS, 'lab')
+    assert interface.run_pca(2)['cached']
+
+def test_in_place_edit_is_refitted_after_load_data():
+    df = frame(1)
+    interface = PCAInterface()
+    interface.load_data(df, COLUMNS)
+    before = interface.run_pca(2)['explained_variance_ratio']
+    df.loc[df.index[:200], 'a'] *= 10
+    interface.load_data(df, COLUMNS)
+    results = interface.run_pca(2)
+    assert not results['cached']
+    assert not np.allclose(results['explained_variance_ratio'], before)
+    np.testing.assert_allclose(results['explained_variance_ratio'], full_fit(df).get_explained_variance_ratio(), rtol=1e-10)
+
+def test_edited_copy_misses_the_cache():
+    df = frame(2)
+    interface = PCAInterface()
+    interface.load_data(df, COLUMNS)
+    interface.run_pca(2)
+    edited = df.copy()
+    edited.iloc[7, 2] += 1.0
+    interface.load_data(edited, COLUMNS)
+    assert not interface.run_pca(2)['cached']
+
+def test_rewritten_file_is_refitted(tmp_path):
+    file_name = str(tmp_path / 'data.csv')
+    frame(3).to_csv(file_name, index=False)
+    interface = PCAInterface()
+    interface.load_file(file_name, COLUMNS, 'lab')
+    before = interface.run_pca(2)['pca_components'].copy()
+    assert interface.run_pca(2)['cached']
+
+    frame(4).to_csv(file_name, index=False)
+    stat = os.stat(file_name)
+    os.utime(file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    interface.load_file(file_name, COLUMNS, 'lab')
+    results = interface.run_pca(2)
+    assert not results['cached']
+    assert not np.allclose(results['pca_components'], before)
+
+def test_selection_changes_reuse_the_column_moments():
+    df = frame(5)
+    interface = PCAInterface()
+    interface.load_data(df, COLUMNS[:3])
+    interface.run_pca(2)
+    moments = interface.get_column_moments()
+    interface.load_data(df, COLUMNS[1:])
+    results = interface.run_pca(2)
+    assert interface.get_column_moments() is moments
+    expected = full_fit(df, COLUMNS[1:])
+    np.testing.assert_allclose(results['explained_variance_ratio'], expected.get_explained_variance_ratio(), rtol=1e-10)
+    np.testing.assert_allclose(np.abs(results['pca_components']), np.abs(expected.transform(df[COLUMNS[1:]].to_numpy())),
+                               atol=1e-10)
+
+def test_column_moments_follow_in_place_edits_and_new_columns():
+    df = frame(6)
+    interface = PCAInterface()
+    interface.load_data(df, COLUMNS)
+    interface.get_column_moments()
+    df['b'] = df['b'] * 3 + 1
+    df['e'] = np.random.default_rng(7).standard_normal(len(df))
+    interface.load_data(df, COLUMNS + ['e'])
+    moments = interface.get_column_moments()
+    expected = StreamingMoments().update(df[[c for c in interface._moment_columns]].to_numpy())
+    np.testing.assert_allclose(moments.mean, expected.mean, rtol=1e-12)
+    np.testing.assert_allclose(moments.comoment, expected.comoment, rtol=1e-10, atol=1e-9)
+
+def test_cache_evicts_least_recently_used():
+    df = frame(8, n=1000)
+    interface = PCAInterface(cache_max_bytes=60_000)
+    interface.load_data(df, COLUMNS)
+    interface.run_pca(2, 'full')
+    interface.run_pca(2, 'randomized')
+    assert interface.run_pca(2, 'full')['cached']
+    interface.run_pca(2, 'covariance_eigh')
+    assert not interface.run_pca(2, 'randomized')['cached']
+
+@pytest.mark.parametrize('solver', ['full', 'randomized'])
+def test_low_memory_tall_fits_use_the_moments(solver):
+    df = frame(9, n=2000).astype({c: 'float32' for c in COLUMNS})
+    interface = PCAInterface(low_memory=True)
+    interface.load_data(df, COLUMNS)
+    results = interface.run_pca(2, solver)
+    assert results['solver'] == 'precomputed_correlation'
+    assert results['pca_components'].dtype == np.float32
+    np.testing.assert_allclose(results['explained_variance_ratio'],
+                               full_fit(df[COLUMNS].astype('float64')).get_explained_variance_ratio(), rtol=1e-6)
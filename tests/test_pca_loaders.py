@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src import pca_loaders
+from src.pca_loaders import open_source
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(rng.standard_normal((40, 10)), columns=[f"c{i}" for i in range(10)])
+
+def write(frame, file_name):
+    if file_name.endswith('.csv'):
+        frame.to_csv(file_name, index=False)
+    elif file_name.endswith('.parquet'):
+        frame.to_parquet(file_name, row_group_size=15)
+    elif file_name.endswith('.feather'):
+        frame.to_feather(file_name, chunksize=15)
+    else:
+        np.save(file_name, frame.to_numpy())
+
+@pytest.mark.parametrize('extension', ['csv', 'parquet', 'feather', 'npy'])
+def test_preview_is_capped_by_cells(tmp_path, frame, monkeypatch, extension):
+    monkeypatch.setattr(pca_loaders, 'PREVIEW_CELLS', 50)
+    monkeypatch.setattr(pca_loaders, 'PREVIEW_COLUMN_GROUP', 3)
+    file_name = str(tmp_path / f"data.{extension}")
+    write(frame, file_name)
+    source = open_source(file_name)
+    assert source.preview.shape == (5, 10)
+    assert len(source.columns) == 10
+    # CSV row counts are only known once a column has been read
+    assert source.n_rows == (None if extension == 'csv' else 40)
+    np.testing.assert_allclose(source.preview.to_numpy(), frame.to_numpy()[:5], rtol=1e-14)
+
+    columns = source.columns[7:] + source.columns[:2]
+    loaded = source.load_columns(columns)
+    np.testing.assert_allclose(loaded[columns].to_numpy(), frame.iloc[:, [7, 8, 9, 0, 1]].to_numpy(), rtol=1e-14)
+    assert source.n_rows == 40
+
+@pytest.mark.parametrize('extension', ['csv', 'parquet', 'feather'])
+def test_short_files_are_previewed_whole(tmp_path, frame, extension):
+    file_name = str(tmp_path / f"data.{extension}")
+    write(frame.iloc[:3], file_name)
+    source = open_source(file_name)
+    assert source.preview.shape == (3, 10) and source.n_rows == 3
+
+class Stop(Exception):
+    pass
+
+@pytest.mark.parametrize('extension', ['csv', 'parquet', 'feather'])
+def test_reads_report_progress_and_can_be_stopped(tmp_path, frame, monkeypatch, extension):
+    monkeypatch.setattr(pca_loaders, 'CSV_BLOCK_BYTES', 1024)
+    file_name = str(tmp_path / f"data.{extension}")
+    write(frame, file_name)
+    messages = []
+    source = open_source(file_name)
+    source.load_columns(['c1', 'c2'], messages.append)
+    assert len(messages) > 1 and messages[-1].startswith('Read 40')
+
+    def stop(message):
+        raise Stop()
+
+    source = open_source(file_name)
+    with pytest.raises(Stop):
+        source.load_columns(['c1'], stop)
+    assert source.frame is None
+    assert list(source.load_columns(['c1']).columns) == ['c1']
+
+def test_csv_types_changing_part_way_are_read_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(pca_loaders, 'CSV_BLOCK_BYTES', 256)
+    file_name = str(tmp_path / 'data.csv')
+    values = list(range(200)) + [0.5]
+    with open(file_name, 'w') as f:
+        f.write('a,b\n' + ''.join(f"{value},x\n" for value in values))
+    messages = []
+    loaded = open_source(file_name).load_columns(['a', 'b'], messages.append)
+    assert any('reading it again' in message for message in messages)
+    assert loaded['a'].dtype == np.float64
+    np.testing.assert_array_equal(loaded['a'].to_numpy(), values)
+    assert (loaded['b'] == 'x').all()
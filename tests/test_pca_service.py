@@ -0,0 +1,78 @@
+import asyncio
+import numpy as np
+import pytest
+from src.pca_calc import PCACalculator, StreamingMoments
+from src.pca_service import ScoringService, start_server, request
+
+COLUMNS = ['a', 'b', 'c', 'd']
+
+@pytest.fixture
+def calculator():
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((500, 4)) @ rng.standard_normal((4, 4))
+    calculator = PCACalculator()
+    calculator.fit_moments(StreamingMoments().update(X), 2)
+    return calculator
+
+def serve(calculator, client, **options):
+    # Runs client(port) against a service on a free localhost port; returns its result and the service
+    async def run():
+        service = ScoringService(calculator, COLUMNS, **options)
+        server = await start_server(service, port=0)
+        try:
+            return await client(server.sockets[0].getsockname()[1]), service
+        finally:
+            server.close()
+            await server.wait_closed()
+            await service.stop()
+    return asyncio.run(run())
+
+def test_concurrent_requests_are_batched(calculator):
+    rows = np.random.default_rng(1).standard_normal((60, 4))
+    batches = [rows[i:i + 3] for i in range(0, len(rows), 3)]
+
+    async def client(port):
+        return await asyncio.gather(*(request('POST', '/transform', {'rows': batch.tolist()}, port=port)
+                                      for batch in batches))
+
+    responses, service = serve(calculator, client, batch_window=0.05)
+    for batch, (status, payload) in zip(batches, responses):
+        assert status == 200
+        np.testing.assert_allclose(payload['scores'], calculator.transform(batch), atol=1e-12)
+    assert service.requests == len(batches)
+    assert service.batches < service.requests
+
+def test_named_columns_are_reordered(calculator):
+    rows = np.random.default_rng(2).standard_normal((5, 4))
+
+    async def client(port):
+        return await request('POST', '/transform', {'rows': rows[:, ::-1].tolist(), 'columns': COLUMNS[::-1]}, port=port)
+
+    (status, payload), _ = serve(calculator, client)
+    assert status == 200
+    np.testing.assert_allclose(payload['scores'], calculator.transform(rows), atol=1e-12)
+
+def test_bad_requests_get_errors(calculator):
+    async def client(port):
+        return [
+            await request('POST', '/transform', {'rows': [[1.0, 2.0]]}, port=port),
+            await request('POST', '/transform', {'values': [[1.0, 2.0, 3.0, 4.0]]}, port=port),
+            await request('POST', '/transform', {'rows': [[1.0] * 4], 'columns': ['a', 'b', 'c', 'x']}, port=port),
+            await request('GET', '/transform', port=port),
+            await request('GET', '/missing', port=port),
+        ]
+
+    responses, service = serve(calculator, client)
+    assert [status for status, _ in responses] == [400, 400, 400, 405, 404]
+    assert all('error' in payload for _, payload in responses)
+    assert service.requests == 0
+
+def test_health_and_stats(calculator):
+    async def client(port):
+        await request('POST', '/transform', {'rows': [[0.0] * 4]}, port=port)
+        return await request('GET', '/health', port=port), await request('GET', '/stats', port=port)
+
+    ((health_status, health), (stats_status, stats)), _ = serve(calculator, client)
+    assert health_status == stats_status == 200
+    assert health['columns'] == COLUMNS and health['n_components'] == 2
+    assert stats['requests'] == 1 and stats['rows'] == 1 and stats['latency_ms']['samples'] == 1
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.pca_calc import PCACalculator, StreamingMoments
+from src.pca_shard import fit_shards, merge_moments, shard_moments
+
+COLUMNS = ['a', 'b', 'c', 'd', 'e']
+
+@pytest.fixture
+def shards(tmp_path):
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((3000, 5)) @ rng.standard_normal((5, 5)) + rng.uniform(-50, 50, 5)
+    sizes = [700, 1, 1300, 999]
+    files, frames, start = [], [], 0
+    for i, size in enumerate(sizes):
+        frame = pd.DataFrame(X[start:start + size], columns=COLUMNS)
+        frame['kind'] = [f"k{j % 3}" for j in range(start, start + size)]
+        files.append(str(tmp_path / f"shard{i}.csv"))
+        frame.to_csv(files[-1], index=False)
+        frames.append(frame)
+        start += size
+    return files, pd.concat(frames, ignore_index=True)
+
+def single_pass(full):
+    calculator = PCACalculator()
+    calculator.fit_moments(StreamingMoments().update(full[COLUMNS].to_numpy()), 3)
+    return calculator
+
+def test_merged_moments_match_single_pass(shards):
+    files, full = shards
+    merged = merge_moments(shard_moments(file_name, COLUMNS) for file_name in files)
+    single = StreamingMoments().update(full[COLUMNS].to_numpy())
+    assert merged.count == single.count
+    np.testing.assert_allclose(merged.mean, single.mean, rtol=1e-13)
+    np.testing.assert_allclose(merged.comoment, single.comoment, rtol=1e-12)
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_sharded_scores_match_single_pass(shards, n_jobs):
+    files, full = shards
+    result = fit_shards(files, COLUMNS, n_components=3, label_column='kind', n_jobs=n_jobs)
+    expected = single_pass(full)
+    assert result['n_jobs'] == n_jobs
+    assert result['shard_rows'] == [700, 1, 1300, 999]
+    np.testing.assert_allclose(result['calculator'].explained_variance, expected.explained_variance, rtol=1e-12)
+    scores = pd.concat(result['scores'], ignore_index=True)
+    np.testing.assert_allclose(scores[['PC1', 'PC2', 'PC3']].to_numpy(), expected.transform(full[COLUMNS].to_numpy()),
+                               atol=1e-10)
+    assert scores['label'].tolist() == full['kind'].tolist()
+
+def test_missing_column_raises(shards):
+    files, _ = shards
+    with pytest.raises(ValueError, match='missing columns'):
+        fit_shards(files, COLUMNS + ['z'], n_jobs=1)
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from src.pca_calc import PCACalculator, align_signs
+
+@pytest.fixture
+def X():
+    X = sparse.random(5000, 300, density=0.02, format='csr', random_state=0)
+    # A constant column: scaled by 1 and left out of the total variance, as StandardScaler does
+    keep = np.ones(300)
+    keep[5] = 0
+    return (X @ sparse.diags(keep)).tocsr()
+
+def test_sparse_fit_matches_dense_full_solver(X):
+    sparse_fit = PCACalculator()
+    sparse_scores = sparse_fit.fit_sparse(X, 4)
+    dense_fit = PCACalculator()
+    dense_scores = dense_fit.fit_transform(X.toarray(), 4, 'full')
+
+    assert sparse_fit.get_solver() == 'sparse_arpack'
+    np.testing.assert_allclose(sparse_fit.components, align_signs(dense_fit.components.copy()), atol=1e-9)
+    np.testing.assert_allclose(np.abs(sparse_scores), np.abs(dense_scores), atol=1e-9)
+    np.testing.assert_allclose(sparse_fit.explained_variance, dense_fit.explained_variance, rtol=1e-10)
+    np.testing.assert_allclose(sparse_fit.get_explained_variance_ratio(), dense_fit.get_explained_variance_ratio(), rtol=1e-10)
+
+def test_sparse_transform_matches_dense_transform(X):
+    calculator = PCACalculator()
+    calculator.fit_sparse(X, 3)
+    np.testing.assert_allclose(calculator.transform(X[:100]), calculator.transform(X[:100].toarray()), atol=1e-12)
+
+def test_sparse_fit_rejects_full_rank(X):
+    with pytest.raises(ValueError):
+        PCACalculator().fit_sparse(X, 300)